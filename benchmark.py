@@ -0,0 +1,30 @@
+
+import os
+import sys
+
+if True:
+    sys.path.append(os.path.dirname(__file__))
+
+from daz_import import register
+from daz_import.Elements.Import import import_daz_file
+from daz_import.Elements.Morph.DriverBenchmark import DriverBenchmark
+from daz_import.Lib.Settings import Debug
+from daz_import.Lib import BlenderStatic
+
+import bpy
+
+# Run in background with: blender -b -P benchmark.py
+# Settings are read from the BENCHMARK entry of the debug env file:
+#   "BENCHMARK": {"file": ..., "morphsets": ["Units", "Jcms"],
+#                 "frames": 100, "repeats": 3, "output": ...}
+
+register()
+
+config = Debug.get('BENCHMARK', {})
+
+if file := config.get('file', Debug.get('IMPORT_FILE')):
+    BlenderStatic.clear_scene()
+    import_daz_file(file)
+    results = DriverBenchmark(config).run(bpy.context)
+    print("Drivers:", results["drivers"])
+    print("Frames:", results["frames"])
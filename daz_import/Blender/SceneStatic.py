@@ -13,9 +13,18 @@ class SceneStatic:
         "DazVerbosity": "verbosity",
         "DazErrorPath": "errorPath",
         "DazCaseSensitivePaths": "caseSensitivePaths",
+        "DazUsePathIndex": "usePathIndex",
+        "DazUseMorphCatalog": "useMorphCatalog",
+        "DazUseSkipLibraries": "useSkipLibraries",
+        "DazUseAssetCache": "useAssetCache",
+        "DazAssetCacheSize": "assetCacheSize",
+        "DazUsePrefetch": "usePrefetch",
+        "DazUseTransferCache": "useTransferCache",
+        "DazTransferCacheSize": "transferCacheSize",
 
         # Debugging
         "DazDump": "useDump",
+        "DazUseMorphReport": "useMorphReport",
         "DazZup": "zup",
         "DazMakeHiddenSliders": "useMakeHiddenSliders",
         "DazShowHiddenObjects": "showHiddenObjects",
@@ -52,6 +61,9 @@ class SceneStatic:
         "DazUseERC": "useERC",
         "DazStripCategory": "useStripCategory",
         "DazUseModifiedMesh": "useModifiedMesh",
+        "DazUseCompactDrivers": "useCompactDrivers",
+        "DazUseMorphBank": "useMorphBank",
+        "DazUseIncrementalMorphs": "useIncrementalMorphs",
 
         # Rigging
         "DazUnflipped": "unflipped",
@@ -2,6 +2,7 @@ import os
 from typing import List, Any, Type, Dict
 from daz_import.Lib.Settings import Settings, Settings, Settings
 from daz_import.Collection import DazPath
+from .PathIndex import PathIndex
 from sys import platform
 
 
@@ -57,6 +58,7 @@ class Collection:
                             filepaths.append(subpath)
 
         cls.paths = filepaths
+        PathIndex.update(filepaths)
 
     @staticmethod
     def fix_path(path: str) -> str:
@@ -106,7 +108,12 @@ class Collection:
     @classmethod
     def path(cls, ref: str, strict=True) -> str:
 
-        def getExistingPath(filepath: str) -> str:
+        def getExistingPath(folder: str, relpath: str) -> str:
+            filepath = PathIndex.find(folder, relpath)
+            if filepath is not None:
+                return filepath
+
+            filepath = (folder + relpath).replace("//", "/")
             if os.path.exists(filepath):
                 return filepath
             elif platform != 'win32':
@@ -125,16 +132,14 @@ class Collection:
                 print("Load", filepath)
         elif path[0] == "/":
             for folder in cls.paths:
-                filepath = folder + path
-                filepath = filepath.replace("//", "/")
-                okpath = getExistingPath(filepath)
+                okpath = getExistingPath(folder, path)
                 if okpath:
                     return okpath
 
-                words = filepath.rsplit("/", 2)
+                words = path.rsplit("/", 2)
 
                 if len(words) == 3 and words[1].lower() == "hiddentemp":
-                    okpath = getExistingPath("%s/%s" % (words[0], words[2]))
+                    okpath = getExistingPath(folder, "%s/%s" % (words[0], words[2]))
                     if okpath:
                         return okpath
 
@@ -163,5 +168,6 @@ class Collection:
     @classmethod
     def clear_import(cls):
         cls.import_paths = []
+        PathIndex.expire()
 
     
\ No newline at end of file
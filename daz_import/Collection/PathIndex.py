@@ -0,0 +1,207 @@
+import os
+import pickle
+from typing import Dict, List, Any, Tuple
+from daz_import.Lib.Settings import Settings
+from daz_import.Lib.Settings.Paths import Paths
+
+
+class PathIndex:
+    """
+    Persistent index of the DAZ library folders.
+    Maps lowercased paths relative to a library folder to the real
+    file paths, so that references are resolved without probing the
+    file system. Folders are rescanned when their mtime changes,
+    at most once per operator. Library folders that lie inside
+    another library folder are looked up in the outer index.
+    """
+
+    version = 2
+    roots: Dict[str, Dict[str, Any]] = {}
+    nested: Dict[str, Tuple[str, str]] = {}
+    refreshed = set()
+    loaded = False
+    dirty = False
+
+    @classmethod
+    def update(cls, folders: List[str]) -> None:
+        if not Settings.usePathIndex:
+            return
+
+        if not cls.loaded:
+            cls.load()
+
+        cls.nested = {}
+        for folder in folders:
+            for outer in folders:
+                if folder.startswith(outer + "/"):
+                    cls.nested[folder] = (outer, folder[len(outer):].lower())
+                    break
+
+        for folder in folders:
+            if folder in cls.nested or folder in cls.refreshed:
+                continue
+            if not os.path.isdir(folder):
+                continue
+            cls.refreshed.add(folder)
+            if folder in cls.roots:
+                cls.refresh(cls.roots[folder])
+            else:
+                print("Indexing DAZ library %s" % folder)
+                record = cls.roots[folder] = {"dirs": {}, "files": {}, "targets": {}}
+                cls.scan(record, "", folder, os.path.realpath(folder))
+                cls.dirty = True
+
+        if cls.dirty:
+            cls.save()
+
+    @classmethod
+    def find(cls, folder: str, relpath: str) -> str:
+        """
+        Return the real path of relpath in folder, or None if it is
+        not in the index, so that the caller looks on disk instead.
+        """
+        if not Settings.usePathIndex:
+            return None
+
+        prefix = ""
+        if folder in cls.nested:
+            folder, prefix = cls.nested[folder]
+
+        record = cls.roots.get(folder)
+
+        if record is None:
+            return None
+
+        return record["files"].get(prefix + relpath.replace("//", "/").lower())
+
+    @classmethod
+    def scan(cls, record: Dict[str, Any], key: str, realdir: str,
+             target: str, recursive=True) -> None:
+        # Symlinked folders may loop, so each real folder is indexed once
+        owner = record["targets"].setdefault(target, key)
+        if owner != key:
+            return
+
+        try:
+            mtime = os.stat(realdir).st_mtime_ns
+            entries = list(os.scandir(realdir))
+        except OSError:
+            return
+
+        subdirs, files = [], []
+
+        for entry in entries:
+            subkey = "%s/%s" % (key, entry.name.lower())
+            realpath = "%s/%s" % (realdir, entry.name)
+
+            try:
+                isdir = entry.is_dir()
+            except OSError:
+                continue
+
+            if isdir:
+                subdirs.append(subkey)
+                if recursive or subkey not in record["dirs"]:
+                    # Only symlinks need resolving
+                    if entry.is_symlink():
+                        subtarget = os.path.realpath(realpath)
+                    else:
+                        subtarget = "%s/%s" % (target, entry.name)
+                    cls.scan(record, subkey, realpath, subtarget)
+            else:
+                files.append(subkey)
+                record["files"][subkey] = realpath
+
+        record["dirs"][key] = [mtime, realdir, subdirs, files, target]
+
+    @classmethod
+    def remove(cls, record: Dict[str, Any], key: str, recursive=True) -> None:
+        if key not in record["dirs"]:
+            return
+
+        _, _, subdirs, files, target = record["dirs"][key]
+
+        for file in files:
+            record["files"].pop(file, None)
+
+        if recursive:
+            for subdir in subdirs:
+                cls.remove(record, subdir)
+            del record["dirs"][key]
+            if record["targets"].get(target) == key:
+                del record["targets"][target]
+
+    @classmethod
+    def refresh(cls, record: Dict[str, Any]) -> None:
+        dirs = record["dirs"]
+
+        for key in list(dirs.keys()):
+            if key not in dirs:
+                continue
+
+            mtime, realdir, subdirs, _, target = dirs[key]
+
+            try:
+                current = os.stat(realdir).st_mtime_ns
+            except OSError:
+                cls.remove(record, key)
+                cls.dirty = True
+                continue
+
+            if current == mtime:
+                continue
+
+            # Only the entries of this folder have changed. Subfolders that
+            # still exist are checked separately by their own mtimes.
+            cls.remove(record, key, recursive=False)
+            cls.scan(record, key, realdir, target, recursive=False)
+
+            for subdir in set(subdirs) - set(dirs[key][2]):
+                cls.remove(record, subdir)
+
+            cls.dirty = True
+
+    @staticmethod
+    def filepath() -> str:
+        return Paths.path_fix(Settings.pathIndexFile)
+
+    @classmethod
+    def load(cls) -> None:
+        cls.loaded = True
+        cls.roots = {}
+
+        try:
+            with open(cls.filepath(), "rb") as fp:
+                version, roots = pickle.load(fp)
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return
+
+        if version == cls.version:
+            cls.roots = roots
+
+    @classmethod
+    def save(cls) -> None:
+        filepath = cls.filepath()
+
+        try:
+            Paths.mkdir_parent(filepath)
+            with open(filepath + ".tmp", "wb") as fp:
+                pickle.dump((cls.version, cls.roots), fp,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filepath + ".tmp", filepath)
+        except OSError as err:
+            print("Could not save path index %s: %s" % (filepath, err))
+
+        cls.dirty = False
+
+    @classmethod
+    def expire(cls) -> None:
+        """Let the next update check the folders again"""
+        cls.refreshed = set()
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.roots = {}
+        cls.refreshed = set()
+        cls.loaded = True
+        cls.dirty = True
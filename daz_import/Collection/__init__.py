@@ -1,2 +1,3 @@
 from .DazPath import DazPath
+from .PathIndex import PathIndex
 from .Collection import Collection
\ No newline at end of file
@@ -1,12 +1,13 @@
 from __future__ import annotations
 from mathutils import Vector, Matrix
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Set
 from daz_import.Lib.Settings import Settings
 from .Asset import Asset
 from .Assets import Assets
 from .Accessor import Accessor
 
-from daz_import.Lib.Files.Json import Json
+from daz_import.Lib.Files.AssetCache import AssetCache
+from daz_import.Lib.Files.AssetPrefetch import AssetPrefetch
 from daz_import.Collection import Collection, DazPath
 
 from copy import deepcopy
@@ -281,11 +282,41 @@ class FileAsset(Asset):
         #raise NotImplementedError(msg)
         return None
 
+    @staticmethod
+    def unused_libraries() -> Set[str]:
+        """Top-level keys that parse will ignore with the current settings"""
+        if not Settings.useSkipLibraries:
+            return set()
+        if Settings.useMorphOnly_:
+            return {"uv_set_library", "geometry_library", "node_library",
+                    "image_library", "material_library", "scene"}
+
+        skip = set()
+        for key, used in [("uv_set_library", Settings.useUV_),
+                          ("geometry_library", Settings.useGeometries_),
+                          ("node_library", Settings.useNodes_),
+                          ("image_library", Settings.useImages_),
+                          ("material_library", Settings.useMaterials_),
+                          ("modifier_library", Settings.useModifiers_)]:
+            if not used:
+                skip.add(key)
+        return skip
+
     @classmethod
     def create_by_url(cls, url: str, toplevel=False, fileref=None) -> FileAsset:
-        return cls.parse_file(Json.load(url),
-                              toplevel=toplevel,
-                              fileref=fileref)
+        skip = cls.unused_libraries()
+        data = None
+
+        if not toplevel:
+            data = AssetPrefetch.take(url, fileref)
+
+        if data is None:
+            data = AssetCache.load(url, skip=skip)
+
+        if toplevel:
+            AssetPrefetch.start(data, skip)
+
+        return cls.parse_file(data, toplevel=toplevel, fileref=fileref)
 
     @classmethod
     def parse_file(cls, dict_: dict, toplevel=False, fileref=None) -> Accessor:
@@ -343,6 +374,7 @@ class FileAsset(Asset):
         from daz_import.Lib.Files.DBZ import DBZ_Static
         from daz_import.Elements.Node import transformDuplis
         from daz_import.Lib.Utility import Progress, Updating
+        from daz_import.Elements.Modifier import MorphBaker
         
         Progress.show(20, 100)
         
@@ -386,6 +418,8 @@ class FileAsset(Asset):
             idx += 1
             asset.build(context, inst)      # Builds morphs 1
 
+        MorphBaker.bake()
+
         Progress.show(90, 100)
 
         for _, inst in self.nodes:
@@ -155,6 +155,43 @@ class DAZ_OT_LoadSettingsFile(DazOperator, SingleFile, JsonFile):
         return SingleFile.invoke(self, context, event)
 
 
+@Registrar()
+class DAZ_OT_RebuildPathIndex(DazOperator):
+    bl_idname = "daz.rebuild_path_index"
+    bl_label = "Rebuild Path Index"
+    bl_description = "Rescan the DAZ library folders and rebuild the path index"
+
+    def run(self, context):
+        from daz_import.Collection import Collection, PathIndex
+        SceneStatic.fromScene(context.scene)
+        PathIndex.clear()
+        Collection.update()
+
+
+@Registrar()
+class DAZ_OT_ClearAssetCache(DazOperator):
+    bl_idname = "daz.clear_asset_cache"
+    bl_label = "Clear Asset Cache"
+    bl_description = "Remove all entries from the asset cache"
+
+    def run(self, context):
+        from daz_import.Lib.Files import AssetCache
+        AssetCache.clear()
+        print("Asset cache %s cleared" % AssetCache.folder())
+
+
+@Registrar()
+class DAZ_OT_ClearTransferCache(DazOperator):
+    bl_idname = "daz.clear_transfer_cache"
+    bl_label = "Clear Transfer Cache"
+    bl_description = "Remove all matching tables from the transfer cache"
+
+    def run(self, context):
+        from daz_import.transfer import MatchCache
+        MatchCache.purge()
+        print("Transfer cache %s cleared" % MatchCache.folder())
+
+
 @Registrar()
 class DAZ_OT_GlobalSettings(DazOperator):
     bl_idname = "daz.global_settings"
@@ -188,12 +225,24 @@ class DAZ_OT_GlobalSettings(DazOperator):
         box.prop(scn, "DazUnitScale")
         box.prop(scn, "DazVerbosity")
         box.prop(scn, "DazCaseSensitivePaths")
+        box.prop(scn, "DazUsePathIndex")
+        box.operator("daz.rebuild_path_index")
+        box.prop(scn, "DazUseMorphCatalog")
+        box.prop(scn, "DazUseSkipLibraries")
+        box.prop(scn, "DazUseAssetCache")
+        box.prop(scn, "DazAssetCacheSize")
+        box.operator("daz.clear_asset_cache")
+        box.prop(scn, "DazUsePrefetch")
+        box.prop(scn, "DazUseTransferCache")
+        box.prop(scn, "DazTransferCacheSize")
+        box.operator("daz.clear_transfer_cache")
 
         box = col.box()
         box.label(text="Debugging")
         box.prop(scn, "DazZup")
         box.prop(scn, "DazUnflipped")
         box.prop(scn, "DazDump")
+        box.prop(scn, "DazUseMorphReport")
         box.prop(scn, "DazShowHiddenObjects")
         box.prop(scn, "DazPruneNodes")
         box.prop(scn, "DazMergeShells")
@@ -231,6 +280,9 @@ class DAZ_OT_GlobalSettings(DazOperator):
         box.prop(scn, "DazUseERC")
         box.prop(scn, "DazStripCategory")
         box.prop(scn, "DazUseModifiedMesh")
+        box.prop(scn, "DazUseCompactDrivers")
+        box.prop(scn, "DazUseMorphBank")
+        box.prop(scn, "DazUseIncrementalMorphs")
 
         box = split.box()
         box.label(text="Materials")
@@ -361,6 +413,22 @@ def register():
         name="Load To Modified Meshes",
         description="Load morphs to meshes that have been modified by merging geografts or lashes.\nWarning: can give incorrect shapekeys if meshes have been modified in edit mode")
 
+    bpy.types.Scene.DazUseCompactDrivers = BoolProperty(
+        name="Compact Drivers",
+        description="Drop zero terms from bone sum drivers, and merge sum drivers with a single term driver into one scripted driver.\nFewer drivers to evaluate")
+
+    bpy.types.Scene.DazUseMorphReport = BoolProperty(
+        name="Morph Load Report",
+        description="Write timings and counts for each loaded morph\nto daz_morph_report.json in the Documents folder")
+
+    bpy.types.Scene.DazUseMorphBank = BoolProperty(
+        name="Morph Bank",
+        description="Keep morphs with zero value as compressed deltas on the mesh.\nShapekeys are made when a morph becomes nonzero, or with Materialize Banked Morphs")
+
+    bpy.types.Scene.DazUseIncrementalMorphs = BoolProperty(
+        name="Incremental Morph Reload",
+        description="Skip morphs whose files and load options are unchanged since they were loaded,\nand remove morphs whose files are gone")
+
     bpy.types.Scene.DazMakeHiddenSliders = BoolProperty(
         name="Make Hidden Sliders",
         description="Create properties for hidden morphs,\nso they can be displayed in the UI",
@@ -556,6 +624,40 @@ def register():
         name="Case-Sensitive Paths",
         description="Convert URLs to lowercase. Works best on Windows.")
 
+    bpy.types.Scene.DazUsePathIndex = BoolProperty(
+        name="Path Index",
+        description="Keep an index of the DAZ library folders on disk.\nSpeeds up file lookups, especially with case-sensitive file systems")
+
+    bpy.types.Scene.DazUseMorphCatalog = BoolProperty(
+        name="Morph Catalog",
+        description="Keep a catalog of the morph folders on disk.\nSpeeds up the morph dialogs with large libraries")
+
+    bpy.types.Scene.DazUseTransferCache = BoolProperty(
+        name="Transfer Cache",
+        description="Keep the matching tables of shapekey transfer on disk.\nTransfers between unchanged meshes skip matching")
+
+    bpy.types.Scene.DazUseSkipLibraries = BoolProperty(
+        name="Skip Unused Libraries",
+        description="Scan past the parts of DAZ files that the current settings do not use, without decoding them.\nFiles read from the asset cache are kept whole")
+
+    bpy.types.Scene.DazTransferCacheSize = IntProperty(
+        name="Transfer Cache Size (MB)",
+        description="Maximum size of the transfer cache.\nLeast recently used entries are removed when exceeded",
+        min=16, max=65536)
+
+    bpy.types.Scene.DazUseAssetCache = BoolProperty(
+        name="Asset Cache",
+        description="Cache decoded DAZ files on disk.\nSpeeds up repeated imports of the same figures")
+
+    bpy.types.Scene.DazAssetCacheSize = IntProperty(
+        name="Asset Cache Size (MB)",
+        description="Maximum size of the asset cache.\nLeast recently used entries are removed when exceeded",
+        min=16, max=65536)
+
+    bpy.types.Scene.DazUsePrefetch = BoolProperty(
+        name="Prefetch Files",
+        description="Load files referenced by a scene, and morph files, in background threads.\nSpeeds up imports from network drives and large morph sets")
+
     bpy.types.Scene.DazUseInstancing = BoolProperty(
         name="Use Instancing",
         description="Use instancing for DAZ instances")
@@ -8,6 +8,66 @@ from daz_import.Lib.VectorStatic import VectorStatic
 from daz_import.Elements.Assets import Assets
 
 
+# -------------------------------------------------------------
+#   Compiled formula
+# -------------------------------------------------------------
+
+
+class CompiledFormula:
+    """
+    A formula with its operations unpacked. The url parsing is shared
+    between all formulas, since the same channels are referred to by
+    many morph files.
+    """
+
+    refKeys = {}
+    outputs = {}
+    urls = {}
+    channels = {}
+
+    def __init__(self, formula: dict):
+        self.formula = formula
+        self.output = formula.get("output")
+        self.stage = formula.get("stage")
+        self.opers = formula.get("operations", [])
+        self.ops = [(struct.get("op"), struct.get("url"), struct.get("val"), struct)
+                    for struct in self.opers]
+
+    @classmethod
+    def refKey(cls, string):
+        if string not in cls.refKeys:
+            base = string.split(":", 1)[-1]
+            cls.refKeys[string] = base.rsplit("?", 1)
+        return cls.refKeys[string]
+
+    @classmethod
+    def parseOutput(cls, string):
+        """Return fileref, output and channel"""
+        if string not in cls.outputs:
+            words = unquote(string).split("#")
+            fileref = words[0].split(":", 1)[-1]
+            output, channel = words[-1].split("?")
+            cls.outputs[string] = (fileref, output, channel)
+        return cls.outputs[string]
+
+    @classmethod
+    def parseUrl(cls, string):
+        """Return prop, type, path and component"""
+        if string not in cls.urls:
+            url = string.split("#")[-1]
+            prop, type = url.split("?")
+            path, comp = cls.channel(type)
+            cls.urls[string] = (unquote(prop), type, path, comp)
+        return cls.urls[string]
+
+    @classmethod
+    def channel(cls, channel):
+        """Return path and component, without the default value"""
+        if channel not in cls.channels:
+            path, comp, _ = Formula.parseChannel(channel)
+            cls.channels[channel] = (path, comp)
+        return cls.channels[channel]
+
 # -------------------------------------------------------------
 #   Formula
 # -------------------------------------------------------------
@@ -19,18 +79,38 @@ class Formula:
         self.__assset: Asset = self
         self.formulas = []
         self.built = False
+        self.__compiled = None
+        self.__resolved = {}
 
     def parse(self, struct: dict):
         if cache := struct.get("formulas"):
             self.formulas = cache
 
+    def compiled(self):
+        """Compile the formulas once. Formulas may be reassigned directly."""
+        if self.__compiled is None or self.__compiled[0] is not self.formulas:
+            self.__compiled = (self.formulas,
+                               [CompiledFormula(formula) for formula in self.formulas])
+        return self.__compiled[1]
+
+    def resolve(self, ref):
+        """Look up an asset, remembering the ones that are found"""
+        if asset := self.__resolved.get(ref):
+            return asset
+
+        asset = self.__assset.get_children(url=ref)
+
+        if asset is not None:
+            self.__resolved[ref] = asset
+        return asset
+
     def build(self, context, inst):
-        for formula in self.formulas:
+        for formula in self.compiled():
             ref, key, value = self._compute_formula(formula)
             if ref is None:
                 continue
 
-            asset: Asset = self.__assset.get_children(url=ref)
+            asset: Asset = self.resolve(ref)
             if asset is None or key != "value":
                 continue
 
@@ -41,39 +121,38 @@ class Formula:
         if not Settings.useMorphOnly_:
             return
             
-        for formula in self.formulas:
+        for formula in self.compiled():
             ref, key, value = self._compute_formula(formula)
             if ref is None:
                 continue
 
-            asset = self.__assset.get_children(url=ref)
+            asset = self.resolve(ref)
             if not asset or not asset.is_instense('Node'):
                 continue
 
             if inst := asset.getInstance(ref, self.caller):
                 inst.formulate(key, value)
 
-    def _compute_formula(self, formula: dict):
-        if len(formula.get("operations", [])) != 3:
+    def _compute_formula(self, formula: CompiledFormula):
+        if len(formula.ops) != 3:
             return None, None, 0
         stack = []
 
-        for struct in formula.get("operations", []):
-            op = struct.get("op")
+        for op, url, val, struct in formula.ops:
             if op == "push":
-                if url := struct.get("url"):
-                    ref, key = self.getRefKey(url)
+                if url:
+                    ref, key = CompiledFormula.refKey(url)
 
                     if ref is None or key != "value":
                         return None, None, 0
 
-                    asset = self.__assset.get_children(url=ref)
+                    asset = self.resolve(ref)
 
                     if not hasattr(asset, "value"):
                         return None, None, 0
                     stack.append(asset.value)
 
-                elif val := struct.get("val"):
+                elif val:
                     stack.append(val)
                 else:
                     ErrorsStatic.report("Cannot push %s" %
@@ -89,12 +168,12 @@ class Formula:
         if len(stack) != 1:
             raise DazError(f"Stack error {stack}")
 
-        ref, key = self.getRefKey(formula["output"])
+        ref, key = CompiledFormula.refKey(formula.output)
         return ref, key, stack[0]
 
     def evalFormulas(self, rig, mesh):
         exprs = {}
-        for formula in self.formulas:
+        for formula in self.compiled():
             self.evalFormula(formula, exprs, rig, mesh)
 
         if not exprs and Settings.verbosity > 3:
@@ -103,19 +182,16 @@ class Formula:
         return exprs
 
     @classmethod
-    def evalFormula(cls, formula: dict, exprs: dict, rig, mesh):
+    def evalFormula(cls, formula: CompiledFormula, exprs: dict, rig, mesh):
         from daz_import.Elements.Bone import getTargetName
 
-        words = unquote(formula["output"]).split("#")
-        fileref = words[0].split(":", 1)[-1]
-        driven = words[-1]
-        output, channel = driven.split("?")
+        fileref, output, channel = CompiledFormula.parseOutput(formula.output)
 
         if channel == "value":
             if mesh is None and rig is None:
                 if Settings.verbosity > 2:
                     print("Cannot drive properties", output)
-                    print("  ", unquote(formula["output"]))
+                    print("  ", unquote(formula.output))
                 return False
             # pb = None
         else:
@@ -131,7 +207,7 @@ class Formula:
 
             # pb = rig.pose.bones[output]
 
-        path, idx, default = cls.parseChannel(channel)
+        path, idx = CompiledFormula.channel(channel)
 
         if output not in exprs.keys():
             exprs[output] = {"*fileref": (fileref, channel)}
@@ -153,22 +229,21 @@ class Formula:
 
         expr = exprs[output][path][idx]
 
-        if "stage" in formula.keys():
+        if formula.stage is not None:
             cls.evalStage(formula, expr)
         else:
             cls.evalOperations(formula, expr)
 
     @classmethod
-    def evalStage(cls, formula: dict, expr: dict):
-        if formula["stage"] == "mult":
-            opers = formula["operations"]
-            prop, type, path, comp = cls.evalUrl(opers[0])
+    def evalStage(cls, formula: CompiledFormula, expr: dict):
+        if formula.stage == "mult":
+            prop, type, path, comp = cls.evalUrl(formula.opers[0])
             if type == "value":
                 expr["mult"] = prop
 
     @classmethod
-    def evalOperations(cls, formula, expr):
-        opers = formula["operations"]
+    def evalOperations(cls, formula: CompiledFormula, expr):
+        opers = formula.opers
         prop, type, path, comp = cls.evalUrl(opers[0])
         factor = "factor"
         if type == "value":
@@ -190,11 +265,7 @@ class Formula:
             print(oper)
             raise RuntimeError("BUG: Operation without URL")
 
-        url = oper["url"].split("#")[-1]
-        prop, type = url.split("?")
-        prop = unquote(prop)
-        path, comp, default = cls.parseChannel(type)
-        return prop, type, path, comp
+        return CompiledFormula.parseUrl(oper["url"])
 
     @staticmethod
     def evalMainOper(opers, expr, factor):
@@ -240,5 +311,4 @@ class Formula:
 
     @staticmethod
     def getRefKey(string):
-        base = string.split(":", 1)[-1]
-        return base.rsplit("?", 1)
+        return CompiledFormula.refKey(string)
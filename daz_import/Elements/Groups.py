@@ -81,6 +81,9 @@ class DazMorphInfoGroup(bpy.types.PropertyGroup):
     text : StringProperty()
     bodypart : StringProperty()
     category : StringProperty()
+    prop : StringProperty()
+    objects : StringProperty()
+    fingerprint : StringProperty()
 
 #-------------------------------------------------------------
 #   Rigidity groups
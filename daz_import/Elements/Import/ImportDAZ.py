@@ -3,7 +3,7 @@ import bpy
 from time import perf_counter
 from typing import List, Any
 
-from daz_import.Lib.Files import MultiFile, FilePath
+from daz_import.Lib.Files import MultiFile, FilePath, AssetCache, AssetPrefetch
 from daz_import.Elements.Render import RenderStatic
 from daz_import.Lib.Files.DBZ import DBZ_Static
 from daz_import.Elements.Node import transformDuplis
@@ -122,16 +122,21 @@ class ImportClass:
 
         print("Parsing data")
 
-        file_asset = FileAsset.create_by_url(filepath, toplevel=True)
+        try:
+            file_asset = FileAsset.create_by_url(filepath, toplevel=True)
 
-        if file_asset is None:
-            msg = ("File not found:  \n%s      " % filepath)
-            raise DazError(msg)        
-        
-        file_asset.import_(context, filepath)
+            if file_asset is None:
+                msg = ("File not found:  \n%s      " % filepath)
+                raise DazError(msg)
+
+            file_asset.import_(context, filepath)
+        finally:
+            # Files that the scene referred to but never used
+            AssetPrefetch.clear()
 
         t2 = perf_counter()
         print('File "%s" loaded in %.3f seconds' % (filepath, t2-t1))
+        AssetCache.report()
 
     def __call__(self, *files: str, mesh_mode: str = 'MORPHED') -> Any:
         Settings.import_mode(mesh_mode)
@@ -1,12 +1,12 @@
 import bpy
-import collections
 import os
+import numpy as np
+from time import perf_counter
 
 from daz_import.Elements.Assets import Assets
 from daz_import.Lib.Settings import Settings, Settings, Settings
 from daz_import.Elements.Formula import Formula
 from daz_import.Lib.Errors import ErrorsStatic
-from daz_import.Lib.VectorStatic import VectorStatic
 from daz_import.Lib.Utility import UtilityStatic
 
 from .Modifier import Modifier
@@ -81,7 +81,6 @@ class Alias(ChannelAsset):
 
 
 class SkinBinding(Modifier):
-
     def __init__(self, fileref):
         Modifier.__init__(self, fileref)
 
@@ -154,7 +153,9 @@ class SkinBinding(Modifier):
             Settings.hdWeights_.append(hdob.name)
 
     def addVertexGroups(self, ob, geonode, rig):
+        t1 = perf_counter()
         bones = geonode.figure.bones
+        groups = []
 
         for joint in self.skin.get("joints"):
 
@@ -189,7 +190,15 @@ class SkinBinding(Modifier):
                                     (bname, ob.name), trigger=(2, 5))
                 continue
 
-            buildVertexGroup(ob, vgname, weights["values"])
+            groups.append((vgname, weights["values"]))
+
+        for vgname, weights in groups:
+            buildVertexGroup(ob, vgname, weights)
+
+        t2 = perf_counter()
+        if Settings.verbosity > 2:
+            print("Vertex groups for %s: %d groups in %.3f seconds" %
+                  (ob.name, len(groups), t2-t1))
 
     def calcLocalWeights(self, bname, joint, rig):
         local_weights = joint["local_weights"]
@@ -212,47 +221,30 @@ class SkinBinding(Modifier):
         if z_delta < max_delta:
             consider.append("y")
 
-        # create deques sorted in descending order
-        weights = [collections.deque(local_weights[letter]["values"]) for letter in consider if
+        weights = [local_weights[letter]["values"] for letter in consider if
                    letter in local_weights]
-        for w in weights:
-            w.reverse()
-        target = []
         calc_weights = []
         if len(weights) == 1:
             calc_weights = weights[0]
         elif len(weights) > 1:
-            self.mergeWeights(weights[0], weights[1], target)
-            calc_weights = target
+            calc_weights = self.mergeWeights(weights[0], weights[1])
         if len(weights) > 2:
             # this happens mostly with zero length bones
-            calc_weights = []
-            self.mergeWeights(target, weights[2], calc_weights)
+            calc_weights = self.mergeWeights(calc_weights, weights[2])
         return calc_weights
 
-    def mergeWeights(self, first, second, target):
+    @staticmethod
+    def mergeWeights(first, second):
         # merge the two local_weight groups and calculate arithmetic mean for vertices that are present in both groups
+        first = np.asarray(first, dtype=np.float64).reshape(-1, 2)
+        second = np.asarray(second, dtype=np.float64).reshape(-1, 2)
+        vnums = np.concatenate((first[:, 0], second[:, 0]))
+        weights = np.concatenate((first[:, 1], second[:, 1]))
 
-        while len(first) > 0 and len(second) > 0:
-            a = first.pop()
-            b = second.pop()
-
-            if a[0] == b[0]:
-                target.append([a[0], (a[1] + b[1]) / 2.0])
-            elif a[0] < b[0]:
-                target.append(a)
-                second.append(b)
-            else:
-                target.append(b)
-                first.append(a)
-
-        while len(first) > 0:
-            a = first.pop()
-            target.append(a)
-
-        while len(second) > 0:
-            b = second.pop()
-            target.append(b)
+        union, inverse, counts = np.unique(
+            vnums, return_inverse=True, return_counts=True)
+        sums = np.bincount(inverse, weights=weights, minlength=len(union))
+        return np.column_stack((union, sums/counts))
 
 
 class LegacySkinBinding(SkinBinding):
@@ -306,6 +298,7 @@ class Morph(FormulaAsset):
 
         self.vertex_count = 0
         self.deltas = []
+        self.deltaArrays = None
         self.hd_url = None
 
     def __repr__(self):
@@ -320,11 +313,13 @@ class Morph(FormulaAsset):
         self.parent = data["parent"]
         morph = data.get("morph", {})
 
-        deltas = morph.get("deltas", {})
-        deltas = deltas.get("values", {})
+        struct = morph.get("deltas", {})
+        deltas = struct.get("values", {})
 
         if deltas is not None:
             self.deltas = deltas
+            # Set by MorphPipeline when the file was decoded off-thread
+            self.deltaArrays = struct.get("arrays")
         else:
             print(f"Morph without deltas: {self.name}")
 
@@ -437,12 +432,11 @@ class Morph(FormulaAsset):
         return self
 
     def addMorphToVerts(self, me):
-        if self.value == 0.0:
+        """Queue the morph. The mesh is updated by MorphBaker.bake."""
+        if self.value == 0.0 or not len(self.deltas):
             return
-        scale = self.value * Settings.scale_
-        for delta in self.deltas:
-            vn = delta[0]
-            me.vertices[vn].co += scale * VectorStatic.create_vector(delta[1:])
+        vnums, vecs = self.getDeltaArrays()
+        MorphBaker.add(me, vnums, vecs * (self.value * Settings.scale_))
 
     def buildMorph(self, ob, useBuild=True, strength=1):
         sname = self.getName()
@@ -455,33 +449,36 @@ class Morph(FormulaAsset):
         if useBuild:
             self.__buildShapeKey(ob, skey, strength)
 
-    def __buildShapeKey(self, ob, skey, strength):
-        if strength != 1:
-            scale = Settings.scale_
-            Settings.scale_ *= strength
-        
-        for v in ob.data.vertices:
-            skey.data[v.index].co = v.co
-
+    @staticmethod
+    def digestDeltas(deltas) -> tuple:
+        """Vertex numbers and unscaled Blender-space deltas"""
+        deltas = np.asarray(deltas, dtype=np.float64).reshape(-1, 4)
+        vnums = deltas[:, 0].astype(np.int64)
+        vecs = deltas[:, 1:4].astype(np.float32)
         if Settings.zup:
+            vecs = vecs[:, [0, 2, 1]]
+            vecs[:, 1] *= -1
+        return vnums, vecs
 
-            if isModifiedMesh(ob):
-                pgs = ob.data.DazOrigVerts
-                for delta in self.deltas:
-                    vn0 = delta[0]
-                    vn = pgs[str(vn0)].a
-                    if vn >= 0:
-                        skey.data[vn].co += VectorStatic.scaled_v2(
-                            delta[1:])
-            else:
-                for delta in self.deltas:
-                    vn = delta[0]
-                    skey.data[vn].co += VectorStatic.scaled_v2(delta[1:])
-        else:
-            for delta in self.deltas:
-                vn = delta[0]
-                skey.data[vn].co += VectorStatic.scaled_and_convert_vector(
-                    delta[1:])
+    def getDeltaArrays(self):
+        if self.deltaArrays is None:
+            self.deltaArrays = self.digestDeltas(self.deltas)
+        return self.deltaArrays
+
+    def getScaledDeltas(self, ob, strength=1):
+        """Vertex numbers in ob and scaled deltas"""
+        vnums, vecs = self.getDeltaArrays()
 
-        if strength != 1:
-            Settings.scale_ = scale
+        if isModifiedMesh(ob):
+            vnums = MeshArrays.remap(ob, vnums)
+            ok = (vnums >= 0)
+            vnums = vnums[ok]
+            vecs = vecs[ok]
+
+        return vnums, vecs * (Settings.scale_ * strength)
+
+    def __buildShapeKey(self, ob, skey, strength):
+        co = MeshArrays.base_coords(ob)
+        vnums, vecs = self.getScaledDeltas(ob, strength)
+        np.add.at(co, vnums, vecs)
+        skey.data.foreach_set("co", co.ravel())
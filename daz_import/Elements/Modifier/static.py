@@ -1,4 +1,5 @@
 import bpy
+import numpy as np
 from daz_import.Lib.BlenderStatic import BlenderStatic
 
 def stripPrefix(prop):
@@ -37,22 +38,42 @@ def getCanonicalKey(key):
 
 
 def buildVertexGroup(ob, vgname, weights, default=None):
-    if weights:
+    if weights is not None and len(weights) > 0:
         if vgname in ob.vertex_groups.keys():
             print("Duplicate vertex group:\n  %s %s" % (ob.name, vgname))
             return ob.vertex_groups[vgname]
         else:
             vgrp = ob.vertex_groups.new(name=vgname)
         if default is None:
-            for vn, w in weights:
-                vgrp.add([vn], w, 'REPLACE')
+            addWeights(vgrp, weights)
         else:
-            for vn in weights:
-                vgrp.add([vn], default, 'REPLACE')
+            vgrp.add(list(weights), default, 'REPLACE')
         return vgrp
     return None
 
 
+def addWeights(vgrp, weights):
+    """
+    Add (vn, w) pairs to a vertex group with one call per distinct weight.
+    Weights are stored as floats in Blender, so pairs are grouped at that
+    precision.
+    """
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, 2)
+    if len(weights) == 0:
+        return 0
+
+    vnums = weights[:, 0].astype(np.int32)
+    ws = weights[:, 1].astype(np.float32)
+    order = np.argsort(ws, kind="stable")
+    ws = ws[order]
+    vnums = vnums[order]
+    values, firsts = np.unique(ws, return_index=True)
+
+    for w, vnlist in zip(values.tolist(), np.split(vnums, firsts[1:])):
+        vgrp.add(vnlist.tolist(), w, 'REPLACE')
+    return len(values)
+
+
 def makeArmatureModifier(name, context, ob, rig):
     mod = ob.modifiers.new(name, 'ARMATURE')
     mod.object = rig
@@ -70,19 +91,101 @@ def makeArmatureModifier(name, context, ob, rig):
 
 def copyVertexGroups(ob, hdob):
     hdvgrps = {}
+    weights = {}
     for vgrp in ob.vertex_groups:
         hdvgrp = hdob.vertex_groups.new(name=vgrp.name)
         hdvgrps[vgrp.index] = hdvgrp
+        weights[vgrp.index] = []
     for v in ob.data.vertices:
         vn = v.index
         for g in v.groups:
-            hdvgrps[g.group].add([vn], g.weight, 'REPLACE')
+            weights[g.group].append((vn, g.weight))
+    for gn, hdvgrp in hdvgrps.items():
+        addWeights(hdvgrp, weights[gn])
 
 
 def isModifiedMesh(ob):
     return (len(ob.data.DazOrigVerts) > 0)
 
 
+class MeshArrays:
+    """
+    Per-mesh arrays that are read once and shared by all morphs
+    loaded in the same operation.
+    """
+    coords = {}
+    origverts = {}
+
+    @classmethod
+    def base_coords(cls, ob) -> np.ndarray:
+        me = ob.data
+        key = (me.as_pointer(), len(me.vertices))
+        if key not in cls.coords:
+            co = np.empty(3*len(me.vertices), dtype=np.float32)
+            me.vertices.foreach_get("co", co)
+            cls.coords[key] = co.reshape(-1, 3)
+        return cls.coords[key].copy()
+
+    @classmethod
+    def orig_verts(cls, ob) -> np.ndarray:
+        """Map from original to current vertex numbers, -1 if removed"""
+        pgs = ob.data.DazOrigVerts
+        key = (ob.data.as_pointer(), len(pgs))
+        if key not in cls.origverts:
+            pairs = np.array([(int(pg.name), pg.a) for pg in pgs],
+                             dtype=np.int64).reshape(-1, 2)
+            size = int(pairs[:, 0].max()) + 1 if len(pairs) else 0
+            vmap = np.full(size, -1, dtype=np.int64)
+            vmap[pairs[:, 0]] = pairs[:, 1]
+            cls.origverts[key] = vmap
+        return cls.origverts[key]
+
+    @classmethod
+    def remap(cls, ob, vnums) -> np.ndarray:
+        vmap = cls.orig_verts(ob)
+        out = np.full(len(vnums), -1, dtype=np.int64)
+        inside = (vnums < len(vmap))
+        out[inside] = vmap[vnums[inside]]
+        return out
+
+    @classmethod
+    def clear(cls):
+        cls.coords = {}
+        cls.origverts = {}
+
+
+class MorphBaker:
+    """
+    Sums the deltas of all morphs applied to a mesh, and writes
+    the vertex coordinates once when baked.
+    """
+    meshes = {}
+
+    @classmethod
+    def add(cls, me, vnums, vecs) -> None:
+        key = me.as_pointer()
+        if key not in cls.meshes:
+            acc = np.zeros((len(me.vertices), 3), dtype=np.float32)
+            cls.meshes[key] = (me, acc)
+        np.add.at(cls.meshes[key][1], vnums, vecs)
+
+    @classmethod
+    def bake(cls) -> None:
+        for me, acc in cls.meshes.values():
+            co = np.empty(3*len(me.vertices), dtype=np.float32)
+            me.vertices.foreach_get("co", co)
+            co += acc.ravel()
+            me.vertices.foreach_set("co", co)
+            me.update()
+        if cls.meshes:
+            MeshArrays.clear()
+        cls.meshes = {}
+
+    @classmethod
+    def clear(cls):
+        cls.meshes = {}
+
+
 def addShapekey(ob, sname):
     if not ob.data.shape_keys:
         basic = ob.shape_key_add(name="Basic")
@@ -0,0 +1,177 @@
+import json
+import math
+from time import perf_counter
+from typing import Dict, Any, List
+
+from daz_import.Lib.Settings.Paths import Paths
+
+
+class DriverBenchmark:
+    """
+    Measures the playback cost of the drivers made by LoadMorph.
+    Loads morph sets to a figure, animates the sliders and bones,
+    and times the depsgraph update of each frame. The drivers are
+    split into SUM, simple expression and python drivers, and the
+    frames are timed again with each kind muted.
+    """
+
+    kinds = ["SUM", "SIMPLE", "PYTHON", "OTHER"]
+    faceMorphsets = ["Units", "Expressions", "Visemes", "Facs", "Facsexpr"]
+
+    def __init__(self, config: Dict[str, Any]):
+        self.morphsets: List[str] = config.get("morphsets", ["Units", "Jcms"])
+        self.nframes: int = int(config.get("frames", 100))
+        self.repeats: int = int(config.get("repeats", 3))
+        self.animateBones: bool = config.get("animateBones", True)
+        self.usePropDrivers: bool = config.get("usePropDrivers", True)
+        self.output: str = config.get("output", "~/Documents/daz_driver_benchmark.json")
+        self.results: Dict[str, Any] = {"config": config}
+
+    @staticmethod
+    def findRig(context):
+        for ob in context.scene.objects:
+            if ob.type == 'ARMATURE' and ob.children:
+                return ob
+        return None
+
+    @staticmethod
+    def kind(fcu) -> str:
+        driver = fcu.driver
+        if driver.type == 'SUM':
+            return 'SUM'
+        elif driver.type != 'SCRIPTED':
+            return 'OTHER'
+        elif getattr(driver, "is_simple_expression", False):
+            return 'SIMPLE'
+        else:
+            return 'PYTHON'
+
+    @staticmethod
+    def allDrivers(rig):
+        rnas = [rig, rig.data]
+        for ob in rig.children:
+            if ob.type == 'MESH' and ob.data.shape_keys:
+                rnas.append(ob.data.shape_keys)
+        for rna in rnas:
+            if rna.animation_data:
+                for fcu in rna.animation_data.drivers:
+                    yield fcu
+
+    def countDrivers(self, rig) -> Dict[str, int]:
+        counts = dict([(kind, 0) for kind in self.kinds])
+        nvars = 0
+        for fcu in self.allDrivers(rig):
+            counts[self.kind(fcu)] += 1
+            nvars += len(fcu.driver.variables)
+        counts["variables"] = nvars
+        return counts
+
+    def loadMorphs(self, context, rig) -> Dict[str, float]:
+        from daz_import.Elements.Morph import StandardMorphLoader, MorphStatic, setupMorphPaths
+        from daz_import.Elements.Morph.data import theAdjusters
+
+        context.view_layer.objects.active = rig
+        setupMorphPaths(False)
+        times = {}
+
+        for morphset in self.morphsets:
+            mloader = StandardMorphLoader()
+            mloader.morphset = morphset
+            mloader.category = ""
+            mloader.adjuster = theAdjusters[morphset]
+            mloader.usePropDrivers = self.usePropDrivers
+            try:
+                files = MorphStatic.files[mloader.char][morphset]
+            except KeyError:
+                print("Character %s has no %s morphs" % (mloader.char, morphset))
+                continue
+            bodypart = ("Face" if morphset in self.faceMorphsets else "Body")
+            namepaths = [(name, path, bodypart)
+                         for name, path in files.items()]
+            if not namepaths:
+                continue
+            if mloader.rig:
+                mloader.rig.DazMorphPrefixes = False
+                mloader.findIked()
+            print("\nLoading %d %s morphs" % (len(namepaths), morphset))
+            t = perf_counter()
+            mloader.getAllMorphs(namepaths, context)
+            times[morphset] = perf_counter() - t
+
+        return times
+
+    def animate(self, rig) -> None:
+        """Keyframe sliders and bones, so that drivers change every frame"""
+        last = self.nframes
+        mid = max(1, last // 2)
+
+        for morphset in self.morphsets:
+            for item in getattr(rig, "Daz"+morphset, []):
+                if item.name in rig.keys():
+                    for frame, value in [(1, 0.0), (mid, 1.0), (last, 0.0)]:
+                        rig[item.name] = value
+                        rig.keyframe_insert('["%s"]' % item.name, frame=frame)
+
+        if self.animateBones:
+            for pb in rig.pose.bones:
+                if pb.rotation_mode == 'QUATERNION':
+                    continue
+                for frame, angle in [(1, 0.0), (mid, 30.0), (last, 0.0)]:
+                    pb.rotation_euler[0] = math.radians(angle)
+                    pb.keyframe_insert("rotation_euler", index=0, frame=frame)
+
+    def timeFrames(self, context) -> Dict[str, Any]:
+        scn = context.scene
+        best = None
+        for _ in range(self.repeats):
+            times = []
+            for frame in range(1, self.nframes+1):
+                t = perf_counter()
+                scn.frame_set(frame)
+                times.append(perf_counter() - t)
+            if best is None or sum(times) < sum(best):
+                best = times
+        ordered = sorted(best)
+        return {
+            "total": sum(best),
+            "mean": sum(best)/len(best),
+            "median": ordered[len(ordered)//2],
+            "max": ordered[-1],
+            "frames": best,
+        }
+
+    def timeMuted(self, context, rig) -> Dict[str, Any]:
+        results = {}
+        fcurves = list(self.allDrivers(rig))
+        for kind in self.kinds:
+            muted = [fcu for fcu in fcurves
+                     if self.kind(fcu) == kind and not fcu.mute]
+            if not muted:
+                continue
+            for fcu in muted:
+                fcu.mute = True
+            results[kind] = self.timeFrames(context)
+            for fcu in muted:
+                fcu.mute = False
+        return results
+
+    def run(self, context) -> Dict[str, Any]:
+        rig = self.findRig(context)
+        if rig is None:
+            raise RuntimeError("No armature with children in scene")
+
+        self.results["before"] = self.countDrivers(rig)
+        self.results["load"] = self.loadMorphs(context, rig)
+        self.results["drivers"] = self.countDrivers(rig)
+        self.animate(rig)
+        self.results["frames"] = self.timeFrames(context)
+        self.results["muted"] = self.timeMuted(context, rig)
+        self.save()
+        return self.results
+
+    def save(self) -> None:
+        filepath = Paths.path_fix(self.output)
+        Paths.mkdir_parent(filepath)
+        with open(filepath, "w", encoding="utf_8") as fp:
+            json.dump(self.results, fp, indent=2)
+        print("Driver benchmark saved to %s" % filepath)
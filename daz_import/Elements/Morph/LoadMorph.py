@@ -1,19 +1,27 @@
 import os
+import re
 import bpy
 from daz_import.driver import DriverUser
 from daz_import.Lib.Errors import ErrorsStatic, DazError
-from daz_import.Lib.Files.Json import Json
+from daz_import.Lib.Files.AssetCache import AssetCache
 from urllib.parse import unquote
 from daz_import.Collection import Collection, DazPath
 from daz_import.utils import *
 from .static import *
 from daz_import.Elements.Assets.FileAsset import FileAsset
+from .MorphCatalog import MorphCatalog
+from .MorphPipeline import MorphPipeline
+from .MorphBank import MorphBank, BankedKey
+from .MorphReport import MorphReport
+from time import perf_counter
 
 
 class LoadMorph(DriverUser):
     morphset = None
     usePropDrivers = True
     treatHD = 'ERROR'
+    nvars = 0
+    mergedPrefix = "m_"
 
     def __init__(self, rig, mesh):
         self.rig = rig
@@ -49,11 +57,17 @@ class LoadMorph(DriverUser):
         self.restdrivers = {}
         self.iked = []
         self.origRestored = []
+        self.nvars = 0
+        self.morphReport = MorphReport()
         self.initAmt()
         self.getAdjustedBones()
 
+        stats = {"object": (self.mesh or self.rig).name}
+
         print("Making morphs")
+        MorphCatalog.refresh()
         self.makeAllMorphs(namepaths, True)
+        MorphCatalog.save()
         if self.loadMissing:
             print("Making missing morphs")
             bodypart = namepaths[0][2]
@@ -62,13 +76,28 @@ class LoadMorph(DriverUser):
             print("Cannot make missing morphs for this type")
         if self.rig:
             self.createTmp()
+            self.nmerged = self.ndropped = 0
+            ndrivers = self.countDrivers()
             try:
+                t = perf_counter()
                 self.buildDrivers()
+                t = self.morphReport.time("buildDrivers", t)
                 self.buildSumDrivers()
+                t = self.morphReport.time("buildSumDrivers", t)
                 self.buildRestDrivers()
+                t = self.morphReport.time("buildRestDrivers", t)
                 self.correctScaleParents()
+                self.morphReport.time("correctScaleParents", t)
             finally:
                 self.deleteTmp()
+            print("Drivers: %d before, %d after. %d sum drivers merged, %d terms dropped" %
+                  (ndrivers, self.countDrivers(), self.nmerged, self.ndropped))
+            stats["drivers"] = {
+                "before": ndrivers,
+                "after": self.countDrivers(),
+                "merged": self.nmerged,
+                "dropped": self.ndropped,
+                "variables": self.nvars}
             self.rig.update_tag()
             if self.mesh:
                 self.mesh.update_tag()
@@ -77,6 +106,7 @@ class LoadMorph(DriverUser):
             for ob in self.origRestored:
                 clearMeshProps(ob.data)
             self.origRestored = []
+        self.morphReport.save(stats)
 
     # ------------------------------------------------------------------
     #   Make all morphs
@@ -84,20 +114,43 @@ class LoadMorph(DriverUser):
 
     def makeAllMorphs(self, namepaths, force):
         namepaths.sort()
-        idx = 0
+        if force and Settings.useIncrementalMorphs:
+            namepaths = self.skipUnchanged(namepaths)
+            self.removeMissing()
         npaths = len(namepaths)
-        for name, path, bodypart in namepaths:
+
+        if Settings.usePrefetch and npaths > 1:
+            jobs = [(path, self.getAliasFile(path))
+                    for _, path, _ in namepaths]
+            payloads = MorphPipeline.run(jobs, FileAsset.unused_libraries())
+        else:
+            payloads = (None for _ in namepaths)
+
+        for idx, (name, path, bodypart) in enumerate(namepaths):
             Progress.show(idx, npaths)
-            idx += 1
-            char = self.makeSingleMorph(name, path, bodypart, force)
+            self.morphReport.begin(name, path)
+            t = perf_counter()
+            payload = next(payloads)
+            self.morphReport.time("wait", t)
+            char = self.makeSingleMorph(name, path, bodypart, force, payload)
+            self.morphReport.end(char)
             print(char, name)
 
     # ------------------------------------------------------------------
     #   First pass: collect data
     # ------------------------------------------------------------------
 
-    def makeSingleMorph(self, name, filepath, bodypart, force):        
-        asset: FileAsset = FileAsset.create_by_url(filepath)
+    def makeSingleMorph(self, name, filepath, bodypart, force, payload=None):
+        t = perf_counter()
+        if payload:
+            data, alias = payload
+            asset: FileAsset = FileAsset.parse_file(data)
+        else:
+            alias = None
+            asset: FileAsset = FileAsset.create_by_url(filepath)
+        t = self.morphReport.time("decode", t)
+        self.morphReport.deltas(asset)
+
         fileref = self.getFileRef(filepath)
 
         self.loaded.append(fileref)
@@ -111,22 +164,61 @@ class LoadMorph(DriverUser):
             return " _"
 
         skey, ok = self.buildShape(asset, bodypart)
+        t = self.morphReport.time("buildShape", t)
 
         if not ok:
             return " #"
         elif self.rig:
             self.makeFormulas(asset, skey)
+            t = self.morphReport.time("makeFormulas", t)
 
         aliaspath = self.getAliasFile(filepath)
         aliases = {}
 
-        if aliaspath is not None:
+        if alias is not None:
+            aliases = self.loadAlias(aliaspath, alias)
+        elif aliaspath is not None:
             aliases = self.loadAlias(aliaspath)
+        t = self.morphReport.time("alias", t)
 
         self.addUrl(asset, aliases, filepath, bodypart)
+        self.morphReport.time("addUrl", t)
 
         return " *"
 
+    def skipUnchanged(self, namepaths):
+        """Drop the morphs whose files have not changed since they were built"""
+        changed = []
+        for namepath in namepaths:
+            path = namepath[1]
+            raw = self.getUnchanged(path)
+            if raw is None:
+                changed.append(namepath)
+                continue
+            self.loaded.append(self.getFileRef(path))
+            self.registerUnchanged(raw)
+        nskipped = len(namepaths) - len(changed)
+        if nskipped:
+            print("Skipped %d unchanged morphs" % nskipped)
+        return changed
+
+    def getUnchanged(self, filepath):
+        return None
+
+    def registerUnchanged(self, raw):
+        """Register a skipped morph as if it had been built again"""
+        if self.mesh and self.mesh.data.shape_keys:
+            skeys = self.mesh.data.shape_keys.key_blocks
+            if raw in skeys.keys():
+                self.shapekeys[raw] = skeys[raw]
+        if self.mesh and raw in MorphBank.entries(self.mesh).keys():
+            self.shapekeys[raw] = BankedKey(self.mesh, raw)
+        if self.rig and raw in self.rig.keys():
+            self.adjustMults(raw, PropsStatic.final(raw))
+
+    def removeMissing(self):
+        return
+
     def alreadyLoaded(self, asset):
         raw = asset.getName()
         final = PropsStatic.final(raw)
@@ -136,17 +228,11 @@ class LoadMorph(DriverUser):
         return False
 
     def getAliasFile(self, filepath):
-        folder = os.path.dirname(filepath)
-        file1 = os.path.basename(filepath)
-
-        for file in os.listdir(folder):
-            if (file[0:5] == "alias" and
-                    file.endswith(file1)):
-                return os.path.join(folder, file)
-        return None
+        return MorphCatalog.alias_file(filepath)
 
-    def loadAlias(self, filepath: str) -> dict:
-        struct = Json.load(filepath)
+    def loadAlias(self, filepath: str, struct: dict = None) -> dict:
+        if struct is None:
+            struct = AssetCache.load(filepath)
         aliases = {}
 
         if self.rig is None:
@@ -225,6 +311,8 @@ class LoadMorph(DriverUser):
             else:
                 ErrorsStatic.report(msg, trigger=(2, 3))
                 return None, False
+        if self.useBank(asset, useBuild):
+            return self.bankShape(asset, bodypart), True
         if not asset.rna:
             asset.buildMorph(self.mesh, useBuild=useBuild)
         skey, _, sname = asset.rna
@@ -252,6 +340,34 @@ class LoadMorph(DriverUser):
         else:
             return None, True
 
+    def useBank(self, asset, useBuild):
+        return (Settings.useMorphBank and
+                self.rig and
+                useBuild and
+                not asset.rna and
+                not asset.hd_url and
+                asset.value == 0.0)
+
+    def bankShape(self, asset, bodypart):
+        from daz_import.hdmorphs import addSkeyToUrls
+        prop = unquote(asset.getName())
+        final = self.addNewProp(prop)
+        adj = self.getGlobalAdjuster()
+        vnums, vecs = asset.getScaledDeltas(self.mesh)
+        MorphBank.store(self.mesh, prop, vnums, vecs, final, adj)
+        skey = BankedKey(self.mesh, prop)
+        self.alias[prop] = asset.getName()
+        self.shapekeys[prop] = skey
+        addSkeyToUrls(self.mesh, asset, skey)
+        pgs = self.mesh.data.DazBodyPart
+        if prop in pgs.keys():
+            item = pgs[prop]
+        else:
+            item = pgs.add()
+            item.name = prop
+        item.s = bodypart
+        return skey
+
     def makeFormulas(self, asset, skey):
         from daz_import.Elements.Formula import Formula
         prop = asset.getName()
@@ -813,6 +929,7 @@ class LoadMorph(DriverUser):
     def addPathVar(self, fcu, varname, rna, path):
         from daz_import.driver import addDriverVar
         addDriverVar(fcu, varname, path, rna)
+        self.nvars += 1
 
     def getDrivenChannel(self, raw):
         rna = self.amt
@@ -1036,6 +1153,7 @@ class LoadMorph(DriverUser):
                                 channel, trigger=(2, 3))
         for j, vname, bname in vars:
             addTransformVar(fcu, vname, ttypes[j], self.rig, bname)
+            self.nvars += 1
         self.addMissingVars(fcu, vvars)
         return fcu
 
@@ -1054,24 +1172,37 @@ class LoadMorph(DriverUser):
                         print("IKE", pb.name)
                         continue
                     pathids = {}
+                    constant = 0.0
                     if channel == "rotation_quaternion" and idx == 0:
-                        path = self.getConstant("Unity", 1.0, pb, idx)
-                        pathids[path] = 'ARMATURE'
+                        constant = 1.0
+                    prefix = self.getChannelPrefix(pb, channel, idx)
                     if fcu0:
                         if fcu0.driver.type == 'SUM':
                             self.recoverOldDrivers(fcu0, drivers)
                         elif channel == "scale":
                             fcu1 = self.findScaleSumDriver(fcu0)
                             if fcu1:
-                                self.recoverOldDrivers(fcu1, drivers)
+                                self.recoverOldDrivers(
+                                    fcu1, drivers, self.isMergedDriver(fcu1))
+                        elif self.isMergedDriver(fcu0):
+                            self.recoverOldDrivers(fcu0, drivers, True)
                         else:
                             path = self.getOrigo(fcu0, pb, channel, idx)
                             pathids[path] = 'ARMATURE'
 
                     pb.driver_remove(channel, idx)
-                    prefix = self.getChannelPrefix(pb, channel, idx)
-                    fcu = self.addSumDriver(prefix, drivers, pathids)
-                    if channel == "scale":
+                    fcu = self.addSumDriver(prefix, drivers, pathids, constant)
+                    if fcu is None:
+                        # No terms left, so the channel is at rest
+                        if channel == "scale":
+                            prop = self.getFinalScaleProp(pb, idx)
+                            self.amt.driver_remove(PropsStatic.ref(prop))
+                            self.amt[prop] = 0.0
+                            self.addScaleDriver(pb, idx)
+                        else:
+                            getattr(pb, channel)[idx] = 0.0
+                        continue
+                    elif channel == "scale":
                         self.ensureAnimData(self.amt)
                         sumfcu = self.amt.animation_data.drivers.from_existing(
                             src_driver=fcu)
@@ -1115,9 +1246,12 @@ class LoadMorph(DriverUser):
             self.amt[rest] = 0.0
             fcu = getRnaDriver(self.amt, PropsStatic.ref(rest))
             if fcu:
-                self.recoverOldDrivers(fcu, drivers)
+                self.recoverOldDrivers(
+                    fcu, drivers, self.isMergedDriver(fcu))
             self.amt.driver_remove(PropsStatic.ref(rest))
             fcu = self.addSumDriver(rest, drivers, {})
+            if fcu is None:
+                continue
             self.ensureAnimData(self.amt)
             sumfcu = self.amt.animation_data.drivers.from_existing(
                 src_driver=fcu)
@@ -1133,8 +1267,11 @@ class LoadMorph(DriverUser):
                 return getRnaDriver(self.amt, trg.data_path)
         return None
 
-    def recoverOldDrivers(self, sumfcu, drivers):
+    def recoverOldDrivers(self, sumfcu, drivers, merged=False):
         from daz_import.driver import getRnaDriver
+        if merged:
+            self.recoverTerms(sumfcu, drivers)
+            return
         for var in sumfcu.driver.variables:
             trg = var.targets[0]
             if trg.id_type == 'OBJECT':
@@ -1142,32 +1279,52 @@ class LoadMorph(DriverUser):
             else:
                 fcu2 = getRnaDriver(self.amt, trg.data_path)
             if fcu2:
-                targets = {}
-                for var2 in fcu2.driver.variables:
-                    if var2.type == 'SINGLE_PROP':
-                        trg2 = var2.targets[0]
-                        targets[var2.name] = trg2
-                string = fcu2.driver.expression
-                while string and string[0] == "(":
-                    string = string[1:-1]
-                words = string.split("*")
-                word1 = words[0]
-                for word2 in words[1:]:
-                    varname = word2[0]
-                    if varname in targets.keys():
-                        trg2 = targets[varname]
-                        prop = unPath(trg2.data_path)
-                        if prop not in drivers.keys():
-                            try:
-                                factor = float(word1)
-                            except ValueError:
-                                msg = ("BUG recoverOldDrivers: not a float\n" +
-                                       "FCU2 %s %d" % (fcu2.data_path, fcu2.array_index) +
-                                       "EXPR %s" % fcu2.driver.expression +
-                                       "TARGETS %s" % list(targets.keys()))
-                                ErrorsStatic.report(msg, trigger=(0, 0))
-                            drivers[prop] = factor
-                    word1 = word2[1:]
+                self.recoverTerms(fcu2, drivers)
+
+    def recoverTerms(self, fcu2, drivers):
+        targets = {}
+        for var2 in fcu2.driver.variables:
+            if var2.type == 'SINGLE_PROP':
+                trg2 = var2.targets[0]
+                targets[var2.name] = trg2
+        string = fcu2.driver.expression
+        while string and string[0] == "(":
+            string = string[1:-1]
+        words = string.split("*")
+        word1 = words[0]
+        for word2 in words[1:]:
+            varname = re.match(r"\w*", word2).group()
+            if varname in targets.keys():
+                trg2 = targets[varname]
+                prop = unPath(trg2.data_path)
+                if prop not in drivers.keys():
+                    try:
+                        factor = float(word1)
+                    except ValueError:
+                        msg = ("BUG recoverOldDrivers: not a float\n" +
+                               "FCU2 %s %d" % (fcu2.data_path, fcu2.array_index) +
+                               "EXPR %s" % fcu2.driver.expression +
+                               "TARGETS %s" % list(targets.keys()))
+                        ErrorsStatic.report(msg, trigger=(0, 0))
+                    drivers[prop] = factor
+            word1 = word2[len(varname):].lstrip("(")
+
+    def isMergedDriver(self, fcu):
+        """A sum driver that addSumDriver has merged into a single scripted driver"""
+        driver = fcu.driver
+        return (driver.type == 'SCRIPTED' and
+                len(driver.variables) > 0 and
+                all(var.name.startswith(self.mergedPrefix) for var in driver.variables))
+
+    def countDrivers(self):
+        ndrivers = 0
+        rnas = [self.rig, self.amt]
+        if self.mesh:
+            rnas.append(self.mesh.data.shape_keys)
+        for rna in rnas:
+            if rna and rna.animation_data:
+                ndrivers += len(rna.animation_data.drivers)
+        return ndrivers
 
     def getOrigo(self, fcu0, pb, channel, idx):
         from daz_import.driver import Driver, removeModifiers
@@ -1262,9 +1419,51 @@ class LoadMorph(DriverUser):
             batches.append((string, vars))
         return batches
 
-    def addSumDriver(self, prefix, drivers, pathids):
+    def compactTerms(self, drivers):
+        """Drop terms that do not contribute to the sum"""
+        terms = dict([(final, factor) for final, factor in drivers.items()
+                      if abs(factor) > 1e-6])
+        self.ndropped += len(drivers) - len(terms)
+        return terms
+
+    def removeTermDrivers(self, prefix):
+        n = 1
+        while (drvprop := self.getTermDriverName(prefix, n)) in self.amt.keys():
+            self.amt.driver_remove(PropsStatic.ref(drvprop))
+            del self.amt[drvprop]
+            n += 1
+
+    def addSumDriver(self, prefix, drivers, pathids, constant=0.0):
+        from daz_import.driver import removeModifiers
+        if Settings.useCompactDrivers:
+            drivers = self.compactTerms(drivers)
         batches = self.getBatches(drivers, prefix)
+        if not (batches or pathids or constant):
+            self.removeTermDrivers(prefix)
+            return None
+
         sumfcu = self.getTmpDriver(0)
+        if Settings.useCompactDrivers and len(batches) == 1 and not pathids:
+            # A single term driver is merged into the sum driver itself.
+            # Its variable names carry mergedPrefix, so that the next
+            # load can tell it from other scripted drivers.
+            self.removeTermDrivers(prefix)
+            string, vars = batches[0]
+            names = "|".join([varname for varname, _ in vars])
+            string = re.sub(r"\b(%s)\b" % names, self.mergedPrefix + r"\1", string)
+            if constant:
+                string += "%+g" % constant
+            sumfcu.driver.type = 'SCRIPTED'
+            sumfcu.driver.expression = string
+            for varname, final in vars:
+                self.addPathVar(sumfcu, self.mergedPrefix + varname,
+                                self.amt, PropsStatic.ref(final))
+            self.nmerged += 1
+            return sumfcu
+
+        if constant:
+            path = self.getConstant("Unity", constant, None, 0)
+            pathids[path] = 'ARMATURE'
         sumfcu.driver.type = 'SUM'
         for n, batch in enumerate(batches):
             string, vars = batch
@@ -1272,17 +1471,13 @@ class LoadMorph(DriverUser):
             self.amt[drvprop] = 0.0
             path = PropsStatic.ref(drvprop)
             self.amt.driver_remove(path)
-            fcu = self.getTmpDriver(1)
+            fcu = self.amt.driver_add(path)
             fcu.driver.type = 'SCRIPTED'
+            removeModifiers(fcu)
             fcu.driver.expression = string
             for varname, final in vars:
                 self.addPathVar(fcu, varname, self.amt, PropsStatic.ref(final))
             pathids[path] = 'ARMATURE'
-            self.ensureAnimData(self.amt)
-            fcu2 = self.amt.animation_data.drivers.from_existing(
-                src_driver=fcu)
-            fcu2.data_path = path
-            self.clearTmpDriver(1)
         for n, data in enumerate(pathids.items()):
             path, idtype = data
             if idtype == 'OBJECT':
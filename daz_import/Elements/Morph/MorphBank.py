@@ -0,0 +1,236 @@
+import bpy
+import zlib
+import base64
+import numpy as np
+from bpy.app.handlers import persistent
+
+from daz_import.Lib import Registrar
+from daz_import.Lib.BlenderStatic import BlenderStatic
+from daz_import.Lib.Errors import DazOperator, IsMesh
+from daz_import.Lib.Utility import PropsStatic
+
+
+class MorphBank:
+    """
+    Morphs kept as compressed sparse deltas in a custom property of the
+    mesh, instead of as dense shapekeys. A shapekey with its driver is
+    made when the final property of the morph first becomes nonzero,
+    whether from a slider, a bone driver or the morph panels, or when
+    the morphs are materialized explicitly. Handlers only schedule the
+    check, which then runs from a timer outside depsgraph evaluation.
+    """
+
+    key = "DazMorphBank"
+    scheduled = False
+
+    @staticmethod
+    def encode(vnums, vecs) -> str:
+        bytes_ = (np.asarray(vnums, dtype=np.int32).tobytes() +
+                  np.asarray(vecs, dtype=np.float32).tobytes())
+        return base64.b64encode(zlib.compress(bytes_)).decode("ascii")
+
+    @staticmethod
+    def decode(string: str, count: int) -> tuple:
+        bytes_ = zlib.decompress(base64.b64decode(string))
+        vnums = np.frombuffer(bytes_, dtype=np.int32, count=count)
+        vecs = np.frombuffer(bytes_, dtype=np.float32, offset=4*count)
+        return vnums, vecs.reshape(-1, 3)
+
+    @classmethod
+    def entries(cls, ob):
+        return ob.data.get(cls.key, {})
+
+    @classmethod
+    def store(cls, ob, sname, vnums, vecs, final="", adj=""):
+        if cls.key not in ob.data.keys():
+            ob.data[cls.key] = {}
+        ob.data[cls.key][sname] = {
+            "deltas": cls.encode(vnums, vecs),
+            "count": len(vnums),
+            "final": final,
+            "adj": adj or "",
+            "min": 0.0,
+            "max": 1.0,
+        }
+
+    @staticmethod
+    def getRig(ob):
+        if ob.parent and ob.parent.type == 'ARMATURE':
+            return ob.parent
+        return None
+
+    @classmethod
+    def remove(cls, ob, sname) -> None:
+        bank = cls.entries(ob)
+        if sname in bank.keys():
+            del bank[sname]
+            if not bank.keys():
+                del ob.data[cls.key]
+
+    @classmethod
+    def materialize(cls, ob, sname):
+        from daz_import.Elements.Modifier import addShapekey
+        from daz_import.driver import addDriverVar, makePropDriver, removeModifiers
+
+        bank = ob.data[cls.key]
+        entry = bank[sname]
+        vnums, vecs = cls.decode(entry["deltas"], entry["count"])
+
+        me = ob.data
+        co = np.empty(3*len(me.vertices), dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+        np.add.at(co, vnums, vecs)
+
+        skey = addShapekey(ob, sname)
+        skey.data.foreach_set("co", co.ravel())
+        skey.slider_min = entry["min"]
+        skey.slider_max = entry["max"]
+
+        rig = cls.getRig(ob)
+        if rig and entry["final"]:
+            fcu = skey.driver_add("value")
+            fcu.driver.type = 'SCRIPTED'
+            removeModifiers(fcu)
+            addDriverVar(fcu, "a", PropsStatic.ref(entry["final"]), rig.data)
+            if adj := entry["adj"]:
+                addDriverVar(fcu, "L", PropsStatic.ref(adj), rig)
+                fcu.driver.expression = "L*a"
+                makePropDriver(PropsStatic.ref(adj), skey,
+                               "slider_max", rig, "x")
+            else:
+                fcu.driver.expression = "a"
+
+        del bank[sname]
+        if not bank.keys():
+            del me[cls.key]
+        return skey
+
+    @classmethod
+    def materializeAll(cls, ob) -> int:
+        snames = list(cls.entries(ob).keys())
+        for sname in snames:
+            cls.materialize(ob, sname)
+        return len(snames)
+
+    @classmethod
+    def materializeActive(cls, ob) -> int:
+        rig = cls.getRig(ob)
+        if rig is None:
+            return 0
+        amt = rig.data
+        snames = [sname for sname, entry in cls.entries(ob).items()
+                  if entry["final"] and amt.get(entry["final"], 0) != 0]
+        for sname in snames:
+            cls.materialize(ob, sname)
+        return len(snames)
+
+    @classmethod
+    def bankedMeshes(cls, rig):
+        return [ob for ob in rig.children
+                if ob.type == 'MESH' and cls.key in ob.data.keys()]
+
+    @classmethod
+    def materializeProps(cls, rig, props) -> int:
+        """Materialize the banked morphs of the rig properties props"""
+        finals = set([PropsStatic.final(prop) for prop in props])
+        n = 0
+        for ob in cls.bankedMeshes(rig):
+            snames = [sname for sname, entry in cls.entries(ob).items()
+                      if entry["final"] in finals]
+            for sname in snames:
+                cls.materialize(ob, sname)
+            n += len(snames)
+        return n
+
+    @classmethod
+    def materializeScene(cls, scn) -> int:
+        """Materialize the banked morphs of all meshes in scn that are active"""
+        n = 0
+        for ob in scn.objects:
+            if ob.type == 'MESH' and cls.key in ob.data.keys():
+                nskeys = cls.materializeActive(ob)
+                if nskeys:
+                    ob.update_tag()
+                n += nskeys
+        return n
+
+    @classmethod
+    def materializeRig(cls, rig) -> int:
+        """Materialize the banked morphs whose final properties are nonzero"""
+        n = 0
+        for ob in cls.bankedMeshes(rig):
+            n += cls.materializeActive(ob)
+        return n
+
+
+class BankedKey:
+    """Stands in for a shapekey while the morph is in the bank"""
+
+    def __init__(self, ob, sname):
+        self.entry = ob.data[MorphBank.key][sname]
+        self.name = sname
+
+    @property
+    def slider_min(self):
+        return self.entry["min"]
+
+    @slider_min.setter
+    def slider_min(self, value):
+        self.entry["min"] = value
+
+    @property
+    def slider_max(self):
+        return self.entry["max"]
+
+    @slider_max.setter
+    def slider_max(self, value):
+        self.entry["max"] = value
+
+
+@Registrar()
+class DAZ_OT_MaterializeMorphs(DazOperator, IsMesh):
+    bl_idname = "daz.materialize_morphs"
+    bl_label = "Materialize Banked Morphs"
+    bl_description = "Make shapekeys for all morphs of the selected meshes\nthat are still kept in the morph bank"
+    bl_options = {'UNDO'}
+
+    def run(self, context):
+        for ob in BlenderStatic.selected_meshes(context):
+            n = MorphBank.materializeAll(ob)
+            if n:
+                print("%s: %d morphs materialized" % (ob.name, n))
+
+
+def materializeTimer():
+    MorphBank.scheduled = False
+    scn = bpy.context.scene
+    if scn and MorphBank.materializeScene(scn):
+        scn.frame_set(scn.frame_current)
+    return None
+
+
+@persistent
+def scheduleHandler(scn, *_):
+    if not MorphBank.scheduled:
+        MorphBank.scheduled = True
+        bpy.app.timers.register(materializeTimer, first_interval=0.0)
+
+
+@persistent
+def renderHandler(scn, *_):
+    MorphBank.materializeScene(scn)
+
+
+@Registrar.func
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(scheduleHandler)
+    bpy.app.handlers.frame_change_post.append(scheduleHandler)
+    bpy.app.handlers.render_pre.append(renderHandler)
+
+
+@Registrar.undo_func
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(scheduleHandler)
+    bpy.app.handlers.frame_change_post.remove(scheduleHandler)
+    bpy.app.handlers.render_pre.remove(renderHandler)
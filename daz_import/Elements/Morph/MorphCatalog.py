@@ -0,0 +1,180 @@
+import os
+import pickle
+import hashlib
+from typing import Dict, List, Any
+from daz_import.Lib.Settings import Settings
+from daz_import.Lib.Settings.Paths import Paths
+
+
+class MorphCatalog:
+    """
+    Persistent catalog of the morph folders in the DAZ libraries.
+    For each folder it keeps the morph files and the alias files,
+    and it is refreshed when the mtime of a folder changes.
+    After refresh, morph sets and alias files are found without
+    touching the file system. Content fingerprints of morph files
+    are kept too, and only recomputed when size or mtime changes.
+    """
+
+    version = 2
+    folders: Dict[str, List[Any]] = {}
+    digests: Dict[str, List[Any]] = {}
+    aliases: Dict[str, str] = {}
+    checked = set()
+    loaded = False
+    dirty = False
+
+    @classmethod
+    def files(cls, folder: str) -> List[str]:
+        """Sorted names of the .duf and .dsf files in folder"""
+        entry = cls.entry(folder)
+        return entry[1] if entry else []
+
+    @classmethod
+    def alias_file(cls, filepath: str) -> str:
+        """Path to the alias file of a morph file, or None"""
+        if filepath in cls.aliases:
+            return cls.aliases[filepath]
+
+        folder = os.path.dirname(filepath)
+        file1 = os.path.basename(filepath)
+        entry = cls.entry(folder)
+        aliaspath = None
+
+        if entry:
+            for file in entry[2]:
+                if file.endswith(file1):
+                    aliaspath = os.path.join(folder, file)
+                    break
+
+        cls.aliases[filepath] = aliaspath
+        return aliaspath
+
+    @classmethod
+    def fingerprint(cls, filepath: str) -> str:
+        """Hash of the contents of filepath, or "" if it does not exist"""
+        if not cls.loaded:
+            cls.load()
+
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return ""
+
+        entry = cls.digests.get(filepath)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+
+        hasher = hashlib.blake2b(digest_size=16)
+        try:
+            with open(filepath, "rb") as fp:
+                for chunk in iter(lambda: fp.read(1 << 20), b""):
+                    hasher.update(chunk)
+        except OSError:
+            return ""
+
+        digest = hasher.hexdigest()
+        cls.digests[filepath] = [stat.st_mtime_ns, stat.st_size, digest]
+        cls.dirty = True
+        return digest
+
+    @classmethod
+    def entry(cls, folder: str) -> List[Any]:
+        if not cls.loaded:
+            cls.load()
+
+        entry = cls.folders.get(folder)
+
+        # Each folder is only checked once per refresh
+        if folder in cls.checked:
+            return entry
+
+        cls.checked.add(folder)
+
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            if entry is not None:
+                del cls.folders[folder]
+                cls.dirty = True
+            return None
+
+        if entry is None or entry[0] != mtime:
+            entry = cls.folders[folder] = cls.scan(folder, mtime)
+            cls.dirty = True
+
+        return entry
+
+    @staticmethod
+    def scan(folder: str, mtime: int) -> List[Any]:
+        try:
+            files = sorted(os.listdir(folder))
+        except OSError:
+            files = []
+
+        morphs, aliases = [], []
+
+        for file in files:
+            ext = os.path.splitext(file)[1]
+            if ext not in [".duf", ".dsf"]:
+                continue
+            morphs.append(file)
+            if file[0:5] == "alias":
+                aliases.append(file)
+
+        return [mtime, morphs, aliases]
+
+    @classmethod
+    def refresh(cls) -> None:
+        """Check the folders again on the next lookup"""
+        cls.checked = set()
+        cls.aliases = {}
+
+    @staticmethod
+    def filepath() -> str:
+        return Paths.path_fix(Settings.morphCatalogFile)
+
+    @classmethod
+    def load(cls) -> None:
+        cls.loaded = True
+        cls.folders = {}
+        cls.digests = {}
+
+        if not Settings.useMorphCatalog:
+            return
+
+        try:
+            with open(cls.filepath(), "rb") as fp:
+                version, folders, digests = pickle.load(fp)
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return
+
+        if version == cls.version:
+            cls.folders = folders
+            cls.digests = digests
+
+    @classmethod
+    def save(cls) -> None:
+        if not (cls.dirty and Settings.useMorphCatalog):
+            return
+
+        filepath = cls.filepath()
+
+        try:
+            Paths.mkdir_parent(filepath)
+            with open(filepath + ".tmp", "wb") as fp:
+                pickle.dump((cls.version, cls.folders, cls.digests), fp,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filepath + ".tmp", filepath)
+        except OSError as err:
+            print("Could not save morph catalog %s: %s" % (filepath, err))
+
+        cls.dirty = False
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.folders = {}
+        cls.digests = {}
+        cls.refresh()
+        cls.loaded = True
+        cls.dirty = True
@@ -0,0 +1,64 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Tuple
+
+from daz_import.Lib.Settings import Settings
+from daz_import.Lib.Files.AssetCache import AssetCache
+
+
+class MorphPipeline:
+    """
+    Decodes morph files in a thread pool while the main thread builds
+    shapekeys and drivers. Workers read, unzip and decode each file and
+    its alias file, and convert the deltas to arrays. All Blender and
+    asset registry work stays on the main thread.
+    """
+
+    @staticmethod
+    def payload(filepath: str, aliaspath: str, skip) -> Tuple[Dict, Dict]:
+        from daz_import.Elements.Modifier import Morph
+
+        data = AssetCache.load(filepath, skip=skip)
+
+        for mod in data.get("modifier_library", []):
+            struct = mod.get("morph", {}).get("deltas")
+            if struct and struct.get("values"):
+                struct["arrays"] = Morph.digestDeltas(struct["values"])
+
+        alias = None
+        if aliaspath is not None:
+            alias = AssetCache.load(aliaspath)
+
+        return data, alias
+
+    @classmethod
+    def run(cls, jobs: List[Tuple[str, str]], skip=()) -> Iterator[Any]:
+        """
+        Yield (data, alias) for each (filepath, aliaspath) in jobs,
+        in order. At most a few files per thread are decoded ahead.
+        """
+        nthreads = max(1, int(Settings.prefetchThreads))
+        ahead = 4 * nthreads
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=nthreads,
+                                thread_name_prefix="daz_morphs") as executor:
+            try:
+                for job in jobs:
+                    pending.append(executor.submit(cls.payload, *job, skip))
+                    if len(pending) >= ahead:
+                        yield cls.result(pending.popleft())
+
+                while pending:
+                    yield cls.result(pending.popleft())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def result(future) -> Any:
+        try:
+            return future.result()
+        except Exception as err:
+            print("Morph decoding failed: %s" % err)
+            return None
@@ -0,0 +1,83 @@
+import json
+import time
+from time import perf_counter
+from typing import Dict, Any, List
+
+from daz_import.Lib.Settings import Settings
+from daz_import.Lib.Settings.Paths import Paths
+
+
+class MorphReport:
+    """
+    Timings for each morph loaded by LoadMorph. Drivers are built
+    after all morphs are loaded, so they are only counted in total.
+    Written as json to Settings.morphReportFile when enabled.
+    """
+
+    stages = ["wait", "decode", "buildShape", "makeFormulas", "alias", "addUrl"]
+
+    def __init__(self):
+        self.morphs: List[Dict[str, Any]] = []
+        self.totals: Dict[str, float] = {}
+        self.current: Dict[str, Any] = None
+        self.t0 = perf_counter()
+
+    def begin(self, name: str, filepath: str) -> None:
+        self.current = {
+            "name": name,
+            "file": filepath,
+            "result": None,
+            "deltas": 0,
+            "times": dict([(stage, 0.0) for stage in self.stages]),
+        }
+        self.morphs.append(self.current)
+
+    def time(self, stage: str, t: float) -> float:
+        """Add the time since t to stage, and return the current time"""
+        t1 = perf_counter()
+        if self.current and stage in self.current["times"]:
+            self.current["times"][stage] += t1 - t
+        else:
+            self.totals[stage] = self.totals.get(stage, 0.0) + t1 - t
+        return t1
+
+    def deltas(self, asset) -> None:
+        if self.current and (deltas := getattr(asset, "deltas", None)) is not None:
+            self.current["deltas"] = len(deltas)
+
+    def end(self, result: str) -> None:
+        self.current["result"] = result.strip()
+        self.current = None
+
+    def summary(self) -> Dict[str, Any]:
+        stages = dict([(stage, 0.0) for stage in self.stages])
+        for morph in self.morphs:
+            for stage, t in morph["times"].items():
+                stages[stage] += t
+        stages.update(self.totals)
+        return {
+            "morphs": len(self.morphs),
+            "deltas": sum([morph["deltas"] for morph in self.morphs]),
+            "stages": stages,
+            "total": perf_counter() - self.t0,
+        }
+
+    def save(self, extra: Dict[str, Any]) -> None:
+        if not Settings.useMorphReport:
+            return
+
+        struct = {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "summary": self.summary(),
+            "morphs": self.morphs,
+        }
+        struct.update(extra)
+        filepath = Paths.path_fix(Settings.morphReportFile)
+
+        try:
+            Paths.mkdir_parent(filepath)
+            with open(filepath, "w", encoding="utf_8") as fp:
+                json.dump(struct, fp, indent=2)
+            print("Morph report saved to %s" % filepath)
+        except OSError as err:
+            print("Could not save morph report %s: %s" % (filepath, err))
@@ -25,6 +25,8 @@ from .static import *
 from .data import *
 
 from .LoadMorph import LoadMorph
+from .MorphCatalog import MorphCatalog
+from .MorphBank import MorphBank
 from daz_import.Lib.Utility import PropsStatic
 
 
@@ -73,6 +75,8 @@ def pinProp(rig, scn, key, morphset, category, frame, value=1.0):
         setMorphs(0.0, rig, morphset, category, scn, frame, True)
         rig[key] = value
         autoKeyProp(rig, key, scn, frame, True)
+        if value:
+            MorphBank.materializeProps(rig, [key])
 
 
 def pinShape(ob, scn, key, category, frame):
@@ -455,6 +459,8 @@ def setupMorphPaths(force):
 
     if MorphStatic.files and not force:
         return
+    if force:
+        MorphCatalog.refresh()
     MorphStatic.files = {}
     MorphStatic.names = {}
 
@@ -500,27 +506,26 @@ def setupMorphPaths(force):
 
             for dazpath in Collection.get_paths():
                 folderpath = "%s/%s" % (dazpath, folder)
+                files = MorphCatalog.files(folderpath)
 
-                if not os.path.exists(folderpath) and Settings.caseSensitivePaths:
+                if not files and Settings.caseSensitivePaths:
                     folderpath = Collection.fix_path(folderpath)
+                    files = MorphCatalog.files(folderpath)
 
-                if os.path.exists(folderpath):
-                    files = list(os.listdir(folderpath))
-                    files.sort()
-                    for file in files:
-                        fname, ext = os.path.splitext(file)
-                        if ext not in [".duf", ".dsf"]:
-                            continue
-                        isright, name = isRightType(
-                            fname, prefixes, strips, includes, excludes)
-                        if isright:
-                            fname = fname.lower()
-                            #fpath = os.path.join(folder, file)
-                            string = "%s/%s" % (folderpath, file)
-                            typeFiles[name] = string.replace("//", "/")
-                            #prop = BoolProperty(name=name, default=True)
-                            #setattr(bpy.types.Scene, "Daz"+name, prop)
-                            typeNames[fname] = name
+                for file in files:
+                    fname = os.path.splitext(file)[0]
+                    isright, name = isRightType(
+                        fname, prefixes, strips, includes, excludes)
+                    if isright:
+                        fname = fname.lower()
+                        #fpath = os.path.join(folder, file)
+                        string = "%s/%s" % (folderpath, file)
+                        typeFiles[name] = string.replace("//", "/")
+                        #prop = BoolProperty(name=name, default=True)
+                        #setattr(bpy.types.Scene, "Daz"+name, prop)
+                        typeNames[fname] = name
+
+    MorphCatalog.save()
 
 
 def isRightType(fname, prefixes, strips, includes, excludes):
@@ -610,12 +615,17 @@ class MorphLoader(LoadMorph):
     def findPropGroup(self, prop):
         return None
 
-    def addUrl(self, asset, aliases, filepath, bodypart):
+    def getMorphUrls(self):
         if self.mesh:
-            pgs = self.mesh.DazMorphUrls
+            return self.mesh.DazMorphUrls
         elif self.rig:
-            pgs = self.rig.DazMorphUrls
+            return self.rig.DazMorphUrls
         else:
+            return None
+
+    def addUrl(self, asset, aliases, filepath, bodypart):
+        pgs = self.getMorphUrls()
+        if pgs is None:
             return
         if filepath not in pgs.keys():
             item = pgs.add()
@@ -627,6 +637,81 @@ class MorphLoader(LoadMorph):
                 item.text = asset.name
             item.category = self.category
             item.bodypart = bodypart
+        else:
+            item = pgs[filepath]
+        item.prop = prop = asset.getName()
+        item.fingerprint = self.getFingerprint(filepath)
+        item.objects = "\n".join([ob.name for ob in self.getBuiltObjects(prop)])
+
+    def getFingerprint(self, filepath):
+        """Fingerprint of the morph file and of the options it was loaded with"""
+        options = (self.usePropDrivers, self.treatHD, Settings.useAdjusters,
+                   Settings.useMorphBank, Settings.useCompactDrivers)
+        return "%s %s" % (MorphCatalog.fingerprint(filepath), options)
+
+    def getBuiltObjects(self, prop):
+        obs = []
+        if self.rig and prop in self.rig.keys():
+            obs.append(self.rig)
+        if self.mesh:
+            skeys = self.mesh.data.shape_keys
+            if ((skeys and prop in skeys.key_blocks.keys()) or
+                    prop in MorphBank.entries(self.mesh).keys()):
+                obs.append(self.mesh)
+        return obs
+
+    def getUnchanged(self, filepath):
+        """The property of a morph that is built from the current file, or None"""
+        pgs = self.getMorphUrls()
+        if pgs is None or filepath not in pgs.keys():
+            return None
+        item = pgs[filepath]
+        if not (item.fingerprint and item.objects):
+            return None
+        if item.morphset != self.morphset or item.category != self.category:
+            return None
+        names = [ob.name for ob in self.getBuiltObjects(item.prop)]
+        if item.objects.split("\n") != names:
+            return None
+        if item.fingerprint != self.getFingerprint(filepath):
+            return None
+        return item.prop
+
+    def registerUnchanged(self, raw):
+        LoadMorph.registerUnchanged(self, raw)
+        if self.rig and raw in self.rig.keys():
+            pgs = self.findPropGroup(raw)
+            if pgs is not None and raw not in pgs.keys():
+                self.addToMorphSet(raw, None, False)
+
+    def removeMissing(self):
+        """Remove morphs of this morphset whose files have been deleted"""
+        pgs = self.getMorphUrls()
+        if pgs is None:
+            return
+        idxs = []
+        for idx, item in enumerate(pgs):
+            if (item.morphset != self.morphset or
+                item.category != self.category or
+                    not item.fingerprint):
+                continue
+            filepath = item.name
+            # A missing library folder is not a removed morph
+            if os.path.exists(filepath) or not os.path.isdir(os.path.dirname(filepath)):
+                continue
+            prop = item.prop
+            if self.rig:
+                removeMorphProp(self.rig, prop)
+            if self.mesh:
+                skeys = self.mesh.data.shape_keys
+                if skeys and prop in skeys.key_blocks.keys():
+                    skeys.driver_remove('key_blocks["%s"].value' % prop)
+                    self.mesh.shape_key_remove(skeys.key_blocks[prop])
+                MorphBank.remove(self.mesh, prop)
+            print("Removed morph %s" % prop)
+            idxs.append(idx)
+        for idx in reversed(idxs):
+            pgs.remove(idx)
 
     def getAllMorphs(self, namepaths, context):
         from time import perf_counter
@@ -1185,6 +1270,86 @@ def removeFromPropGroup(pgs, prop):
     for n in idxs:
         pgs.remove(n)
 
+
+def removeMorphProp(rig, raw, useDeleteShapekeys=True, useDeleteDrivers=True, useDeleteProps=True):
+    amt = rig.data
+    final = PropsStatic.final(raw)
+    rest = PropsStatic.rest(raw)
+    if raw in rig.keys():
+        rig[raw] = 0.0
+    if useDeleteDrivers:
+        removePropDrivers(rig, PropsStatic.ref(raw), rig)
+        removePropDrivers(amt, PropsStatic.ref(final), amt)
+        removePropDrivers(amt, PropsStatic.ref(rest), amt)
+    for ob in rig.children:
+        if ob.type == 'MESH':
+            removePropDrivers(
+                ob.data.shape_keys, PropsStatic.ref(raw), rig)
+            removePropDrivers(
+                ob.data.shape_keys, PropsStatic.ref(final), amt)
+            if useDeleteShapekeys and ob.data.shape_keys:
+                if raw in ob.data.shape_keys.key_blocks.keys():
+                    skey = ob.data.shape_keys.key_blocks[raw]
+                    ob.shape_key_remove(skey)
+            if useDeleteShapekeys:
+                MorphBank.remove(ob, raw)
+    if raw in rig.keys():
+        removeFromPropGroups(rig, raw)
+    if useDeleteProps and useDeleteDrivers:
+        if raw in rig.keys():
+            rig[raw] = 0.0
+            del rig[raw]
+        if final in amt.keys():
+            amt[final] = 0.0
+            del amt[final]
+        if rest in amt.keys():
+            amt[rest] = 0.0
+            del amt[rest]
+
+
+def removePropDrivers(rna, path, rig):
+    def matchesPath(var, path, rig):
+        if var.type == 'SINGLE_PROP':
+            trg = var.targets[0]
+            return (trg.id == rig and trg.data_path == path)
+        return False
+
+    if rna is None or rna.animation_data is None:
+        return
+    fcus = []
+    for fcu in rna.animation_data.drivers:
+        if fcu.data_path == path:
+            fcus.append(fcu)
+            continue
+        vars = []
+        keep = False
+        for var in fcu.driver.variables:
+            if matchesPath(var, path, rig):
+                vars.append(var)
+            else:
+                keep = True
+        if keep:
+            if fcu.driver.type == 'SCRIPTED':
+                string = fcu.driver.expression
+                for var in vars:
+                    string = string.replace(var.name, "0")
+                fcu.driver.expression = string
+            for var in vars:
+                fcu.driver.variables.remove(var)
+        else:
+            fcus.append(fcu)
+    for fcu in fcus:
+        try:
+            rna.driver_remove(fcu.data_path, fcu.array_index)
+        except TypeError:
+            pass
+
+
+def removeFromPropGroups(rig, prop):
+    for morphset in theStandardMorphSets:
+        pgs = getattr(rig, "Daz" + morphset)
+        removeFromPropGroup(pgs, prop)
+
 # ------------------------------------------------------------------------
 #   Remove category
 # ------------------------------------------------------------------------
@@ -1231,92 +1396,23 @@ class DAZ_OT_RemoveCategories(DazOperator, Selector, IsArmature):
     def runMesh(self, context, ob, items):
         for idx, key in items:
             cat = ob.DazMorphCats[key]
+            if self.useDeleteShapekeys:
+                for pg in cat.morphs:
+                    MorphBank.remove(ob, pg.name)
             ob.DazMorphCats.remove(idx)
         if len(ob.DazMorphCats) == 0:
             ob.DazMeshMorphs = False
 
     def runRig(self, context, rig, items):
-        amt = rig.data
         for idx, key in items:
             cat = rig.DazMorphCats[key]
             for pg in cat.morphs:
-                raw = pg.name
-                final = PropsStatic.final(raw)
-                rest = PropsStatic.rest(raw)
-                if raw in rig.keys():
-                    rig[raw] = 0.0
-                if self.useDeleteDrivers:
-                    self.removePropDrivers(rig, PropsStatic.ref(raw), rig)
-                    self.removePropDrivers(amt, PropsStatic.ref(final), amt)
-                    self.removePropDrivers(amt, PropsStatic.ref(rest), amt)
-                for ob in rig.children:
-                    if ob.type == 'MESH':
-                        self.removePropDrivers(
-                            ob.data.shape_keys, PropsStatic.ref(raw), rig)
-                        self.removePropDrivers(
-                            ob.data.shape_keys, PropsStatic.ref(final), amt)
-                        if self.useDeleteShapekeys and ob.data.shape_keys:
-                            if raw in ob.data.shape_keys.key_blocks.keys():
-                                skey = ob.data.shape_keys.key_blocks[raw]
-                                ob.shape_key_remove(skey)
-                if raw in rig.keys():
-                    self.removeFromPropGroups(rig, raw)
-                if self.useDeleteProps and self.useDeleteDrivers:
-                    if raw in rig.keys():
-                        rig[raw] = 0.0
-                        del rig[raw]
-                    if final in amt.keys():
-                        amt[final] = 0.0
-                        del amt[final]
-                    if rest in amt.keys():
-                        amt[rest] = 0.0
-                        del amt[rest]
+                removeMorphProp(rig, pg.name, self.useDeleteShapekeys,
+                                self.useDeleteDrivers, self.useDeleteProps)
             rig.DazMorphCats.remove(idx)
         if len(rig.DazMorphCats) == 0:
             rig.DazCustomMorphs = False
 
-    def removePropDrivers(self, rna, path, rig):
-        def matchesPath(var, path, rig):
-            if var.type == 'SINGLE_PROP':
-                trg = var.targets[0]
-                return (trg.id == rig and trg.data_path == path)
-            return False
-
-        if rna is None or rna.animation_data is None:
-            return
-        fcus = []
-        for fcu in rna.animation_data.drivers:
-            if fcu.data_path == path:
-                fcus.append(fcu)
-                continue
-            vars = []
-            keep = False
-            for var in fcu.driver.variables:
-                if matchesPath(var, path, rig):
-                    vars.append(var)
-                else:
-                    keep = True
-            if keep:
-                if fcu.driver.type == 'SCRIPTED':
-                    string = fcu.driver.expression
-                    for var in vars:
-                        string = string.replace(var.name, "0")
-                    fcu.driver.expression = string
-                for var in vars:
-                    fcu.driver.variables.remove(var)
-            else:
-                fcus.append(fcu)
-        for fcu in fcus:
-            try:
-                rna.driver_remove(fcu.data_path, fcu.array_index)
-            except TypeError:
-                pass
-
-    def removeFromPropGroups(self, rig, prop):
-        for morphset in theStandardMorphSets:
-            pgs = getattr(rig, "Daz" + morphset)
-            removeFromPropGroup(pgs, prop)
-
     def selectCondition(self, item):
         return True
 
@@ -1486,11 +1582,15 @@ def getCustomMorphs(scn, ob, category):
 
 def setMorphs(value, rig, morphset, category, scn, frame, force):
     morphs = getRelevantMorphs(scn, rig, morphset, category)
+    changed = []
     for morph in morphs:
         if (getActivated(rig, rig, morph, force) and
                 isinstance(rig[morph], float)):
             rig[morph] = value
             autoKeyProp(rig, morph, scn, frame, force)
+            changed.append(morph)
+    if value:
+        MorphBank.materializeProps(rig, changed)
 
 
 def clearShapes(ob, category, scn, frame):
@@ -1542,6 +1642,8 @@ class DAZ_OT_SetMorphs(DazPropsOperator, MorphsetString, IsMeshArmature):
             setMorphs(self.value, rig, self.morphset,
                       self.category, scn, scn.frame_current, False)
             Updating.rig_drivers(context, rig)
+            if MorphBank.materializeRig(rig):
+                Updating.rig_drivers(context, rig)
 
 
 @Registrar()
@@ -2118,6 +2220,8 @@ class DAZ_OT_PinProp(DazOperator, MorphsetString, IsMeshArmature):
         pinProp(rig, scn, self.key, self.morphset,
                 self.category, scn.frame_current)
         Updating.rig_drivers(context, rig)
+        if rig and MorphBank.materializeRig(rig):
+            Updating.rig_drivers(context, rig)
 
 
 @Registrar()
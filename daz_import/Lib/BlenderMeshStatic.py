@@ -0,0 +1,92 @@
+import bpy
+import numpy as np
+from typing import Sequence
+
+
+class BlenderMeshStatic:
+
+    @staticmethod
+    def face_arrays(faces: Sequence) -> tuple:
+        """Flatten faces into (loop indices, loop starts, loop totals)"""
+        if hasattr(faces, "offsets"):
+            offsets = faces.offsets
+            return (faces.indices, offsets[:-1],
+                    np.diff(offsets).astype(np.int32))
+
+        totals = np.fromiter((len(f) for f in faces),
+                             dtype=np.int32, count=len(faces))
+        starts = np.zeros(len(faces), dtype=np.int32)
+        if len(faces) > 1:
+            np.cumsum(totals[:-1], out=starts[1:])
+
+        indices = np.fromiter((vn for f in faces for vn in f),
+                              dtype=np.int32, count=int(totals.sum()))
+        return indices, starts, totals
+
+    @classmethod
+    def build(cls, me, verts, edges, faces, offset=None) -> None:
+        """
+        Fill an empty mesh with foreach_set, equivalent to from_pydata.
+        If offset is given, it is subtracted from all vertex coordinates.
+        """
+        co = np.asarray(verts, dtype=np.float32).reshape(-1, 3)
+
+        if offset is not None:
+            co = co - np.asarray(offset, dtype=np.float32)
+
+        me.vertices.add(len(co))
+        me.vertices.foreach_set("co", co.ravel())
+
+        if len(edges):
+            edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+            me.edges.add(len(edges))
+            me.edges.foreach_set("vertices", edges.ravel())
+
+        if len(faces):
+            indices, starts, totals = cls.face_arrays(faces)
+            me.loops.add(len(indices))
+            me.loops.foreach_set("vertex_index", indices)
+            me.polygons.add(len(starts))
+            me.polygons.foreach_set("loop_start", starts)
+            if bpy.app.version < (4, 0, 0):
+                me.polygons.foreach_set("loop_total", totals)
+
+        me.update(calc_edges=bool(len(faces)), calc_edges_loose=bool(len(edges)))
+
+    @staticmethod
+    def loop_polygons(me) -> tuple:
+        """Return (vertex index, polygon index) of each loop"""
+        nloops = len(me.loops)
+        npolys = len(me.polygons)
+
+        loopvns = np.zeros(nloops, dtype=np.int32)
+        me.loops.foreach_get("vertex_index", loopvns)
+        starts = np.zeros(npolys, dtype=np.int32)
+        me.polygons.foreach_get("loop_start", starts)
+        totals = np.zeros(npolys, dtype=np.int32)
+        me.polygons.foreach_get("loop_total", totals)
+
+        offsets = np.zeros(npolys, dtype=np.int64)
+        if npolys > 1:
+            np.cumsum(totals[:-1], out=offsets[1:])
+        ramp = np.arange(int(totals.sum())) - np.repeat(offsets, totals)
+        loops = np.repeat(starts, totals) + ramp
+
+        looppolys = np.zeros(nloops, dtype=np.int32)
+        looppolys[loops] = np.repeat(np.arange(npolys, dtype=np.int32), totals)
+        return loopvns, looppolys
+
+    @staticmethod
+    def set_materials(me, material_indices, smooth=True) -> None:
+        npolys = len(me.polygons)
+
+        if npolys == 0:
+            return
+
+        n = min(npolys, len(material_indices))
+        mnums = np.zeros(npolys, dtype=np.int32)
+        mnums[:n] = np.asarray(material_indices, dtype=np.int32)[:n]
+        smooths = np.zeros(npolys, dtype=bool)
+        smooths[:n] = smooth
+        me.polygons.foreach_set("material_index", mnums)
+        me.polygons.foreach_set("use_smooth", smooths)
@@ -0,0 +1,187 @@
+import os
+import pickle
+import hashlib
+import threading
+from typing import Dict, Any
+
+from daz_import.Lib.Settings import Settings
+from daz_import.Lib.Settings.Json import Json
+from daz_import.Lib.Settings.Paths import Paths
+
+
+class AssetCache:
+    """
+    On-disk cache of decoded DAZ asset files.
+    Entries are keyed by absolute path and invalidated when the
+    mtime or size of the source file changes. The counters are
+    guarded by a lock, since prefetch threads load through the cache.
+    """
+
+    extension = ".pickle"
+    protocol = min(5, pickle.HIGHEST_PROTOCOL)
+
+    _total = None
+    _lock = threading.RLock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def folder() -> str:
+        return Paths.path_fix(Settings.assetCacheDir)
+
+    @staticmethod
+    def limit() -> int:
+        return int(Settings.assetCacheSize) * 1024 * 1024
+
+    @classmethod
+    def entry_path(cls, filepath: str) -> str:
+        key = hashlib.sha1(filepath.encode("utf_8")).hexdigest()
+        return os.path.join(cls.folder(), key[:2], key + cls.extension)
+
+    @classmethod
+    def load(cls, filepath: str, mustOpen=False, skip=()) -> Dict[str, Any]:
+        # Entries always hold the complete file, so skip only saves
+        # memory when the cache is off or the file is not cached
+        if not Settings.useAssetCache:
+            return Json.load(filepath, mustOpen=mustOpen, skip=skip)
+
+        filepath = os.path.abspath(filepath)
+
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return Json.load(filepath, mustOpen=mustOpen, skip=skip)
+
+        entry = cls.entry_path(filepath)
+
+        if (data := cls._read(entry, filepath, stat)) is not None:
+            with cls._lock:
+                cls.hits += 1
+            return data
+
+        with cls._lock:
+            cls.misses += 1
+        data = Json.load(filepath, mustOpen=mustOpen)
+
+        if data:
+            cls._write(entry, filepath, stat, data)
+
+        return data
+
+    @classmethod
+    def _read(cls, entry: str, filepath: str, stat: os.stat_result):
+        try:
+            with open(entry, "rb") as fp:
+                path, mtime, size, data = pickle.load(fp)
+        except (OSError, EOFError, ValueError, TypeError,
+                AttributeError, pickle.UnpicklingError):
+            return None
+
+        if path != filepath or mtime != stat.st_mtime_ns or size != stat.st_size:
+            return None
+
+        # Touch the entry so eviction is least recently used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        return data
+
+    @classmethod
+    def _write(cls, entry: str, filepath: str, stat: os.stat_result, data: dict):
+        struct = (filepath, stat.st_mtime_ns, stat.st_size, data)
+
+        try:
+            bytes_ = pickle.dumps(struct, protocol=cls.protocol)
+        except (pickle.PicklingError, TypeError, RecursionError):
+            return
+
+        if len(bytes_) > cls.limit():
+            return
+
+        tmp = "%s.%d.tmp" % (entry, threading.get_ident())
+
+        try:
+            Paths.mkdir_parent(entry)
+            with open(tmp, "wb") as fp:
+                fp.write(bytes_)
+        except OSError as err:
+            print("Could not write asset cache entry for %s: %s" %
+                  (filepath, err))
+            return
+
+        with cls._lock:
+            # Count the folder before the new entry replaces the old one
+            old = os.path.getsize(entry) if os.path.exists(entry) else 0
+            total = cls.size() - old + len(bytes_)
+
+            try:
+                os.replace(tmp, entry)
+            except OSError as err:
+                print("Could not write asset cache entry for %s: %s" %
+                      (filepath, err))
+                return
+
+            cls._total = total
+
+            if cls._total > cls.limit():
+                cls.evict()
+
+    @classmethod
+    def _entries(cls):
+        folder = cls.folder()
+
+        if not os.path.isdir(folder):
+            return
+
+        for sub in os.scandir(folder):
+            if not sub.is_dir():
+                continue
+            for file in os.scandir(sub.path):
+                if file.name.endswith(cls.extension):
+                    yield file
+
+    @classmethod
+    def size(cls) -> int:
+        with cls._lock:
+            if cls._total is None:
+                cls._total = sum(file.stat().st_size for file in cls._entries())
+            return cls._total
+
+    @classmethod
+    def evict(cls, limit: int = None):
+        if limit is None:
+            limit = cls.limit()
+
+        with cls._lock:
+            entries = [(file.stat().st_mtime, file.stat().st_size, file.path)
+                       for file in cls._entries()]
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+
+            # Evict down to 90% of the limit, so that we don't evict on every write
+            target = int(limit * 0.9)
+
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+            cls._total = total
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls.evict(limit=0)
+            cls.hits = cls.misses = 0
+
+    @classmethod
+    def report(cls):
+        if Settings.useAssetCache and Settings.verbosity > 2:
+            print("Asset cache: %d hits, %d misses, %.1f MB" %
+                  (cls.hits, cls.misses, cls.size() / (1024 * 1024)))
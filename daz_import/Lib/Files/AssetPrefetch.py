@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator
+
+from daz_import.Lib.Settings import Settings
+from daz_import.Collection import Collection, DazPath
+from .AssetCache import AssetCache
+
+
+class AssetPrefetch:
+    """
+    Loads the files referenced by a scene file in a thread pool,
+    so that finding, reading and decoding overlap with parsing.
+    Pending loads are keyed by file reference, and the workers
+    resolve the references to paths.
+    """
+
+    executor: ThreadPoolExecutor = None
+    pending: Dict[str, Any] = {}
+
+    @staticmethod
+    def references(data: Dict[str, Any]) -> Iterator[str]:
+        scene = data.get("scene", {})
+
+        for key in ["nodes", "modifiers", "materials"]:
+            for struct in scene.get(key, []):
+                for ref in ["url", "parent"]:
+                    if url := struct.get(ref):
+                        yield url
+                for geo in struct.get("geometries", []):
+                    if url := geo.get("url"):
+                        yield url
+
+    @staticmethod
+    def load(fileref: str, skip=()):
+        filepath = Collection.path(fileref, strict=False)
+
+        if not filepath:
+            return None, None
+
+        return filepath, AssetCache.load(filepath, skip=skip)
+
+    @classmethod
+    def start(cls, data: Dict[str, Any], skip=()):
+        if not Settings.usePrefetch:
+            return
+
+        for url in cls.references(data):
+            fileref = DazPath.normalize(url).split("#")[0]
+
+            if len(fileref) < 3 or fileref[0] != "/" or fileref in cls.pending:
+                continue
+
+            if cls.executor is None:
+                cls.executor = ThreadPoolExecutor(
+                    max_workers=max(1, int(Settings.prefetchThreads)),
+                    thread_name_prefix="daz_prefetch")
+
+            cls.pending[fileref] = cls.executor.submit(
+                cls.load, fileref, skip=skip)
+
+        if Settings.verbosity > 2 and cls.pending:
+            print("Prefetching %d files" % len(cls.pending))
+
+    @classmethod
+    def take(cls, filepath: str, fileref: str) -> Dict[str, Any]:
+        if not (fileref and cls.pending):
+            return None
+
+        future = cls.pending.pop(DazPath.normalize(fileref), None)
+
+        if future is None:
+            return None
+
+        try:
+            path, data = future.result()
+        except Exception as err:
+            print("Prefetch of %s failed: %s" % (filepath, err))
+            return None
+
+        if path != filepath:
+            return None
+
+        return data
+
+    @classmethod
+    def clear(cls):
+        for future in cls.pending.values():
+            future.cancel()
+
+        cls.pending = {}
+
+        if cls.executor:
+            cls.executor.shutdown(wait=False)
+            cls.executor = None
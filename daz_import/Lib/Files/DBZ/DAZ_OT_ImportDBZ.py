@@ -1,5 +1,6 @@
 from __future__ import annotations
 import os
+import numpy as np
 from daz_import.Lib.Settings import Settings
 from daz_import.Lib.Errors import DazOperator, IsMesh
 from daz_import.Lib.Files import MultiFile, DbzFile
@@ -57,8 +58,8 @@ class DAZ_OT_ImportDBZ(DazOperator, DbzFile, MultiFile):
             print("Try %s (%d verts)" % (name, len(verts)))
             if len(verts) == len(ob.data.vertices):
                 skey = ob.shape_key_add(name=sname)
-                for vn, co in enumerate(verts):
-                    skey.data[vn].co = co
+                skey.data.foreach_set(
+                    "co", np.asarray(verts, dtype=np.float32).ravel())
                 print("Morph %s created" % sname)
                 return True
         return False
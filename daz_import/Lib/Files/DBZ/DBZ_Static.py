@@ -125,7 +125,7 @@ class DBZ_Static:
 
     @staticmethod
     def load(filepath: str) -> DBZInfo:
-        from daz_import.geometry import d2bList
+        from daz_import.geometry import d2bArray
 
         dbz = DBZInfo()
         struct = Json.load(filepath)
@@ -151,7 +151,7 @@ class DBZ_Static:
                 dbz.objects[name] = []
 
             if "vertices" in figure.keys():
-                verts = d2bList(figure["vertices"])
+                verts = d2bArray(figure["vertices"])
                 edges = faces = uvs = matgroups = []
                 props = {}
 
@@ -180,7 +180,7 @@ class DBZ_Static:
                 props = {}
                 for key, value in figure.items():
                     if key == "hd vertices":
-                        verts = d2bList(value)
+                        verts = d2bArray(value)
                     elif key == "subd level":
                         lod = value
                     elif key == "hd uvs":
@@ -1,6 +1,8 @@
 from .Extensions import *
 from .FilePath import FilePath
 from .Json import Json
+from .AssetCache import AssetCache
+from .AssetPrefetch import AssetPrefetch
 from .Helpers import MultiFile, SingleFile
 
 getExistingFilePath = FilePath.getExistingFilePath
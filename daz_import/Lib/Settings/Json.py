@@ -1,12 +1,182 @@
 import os
+import re
 import json
 import gzip
 import codecs
+import numpy as np
 from mathutils import Vector, Color
 # from daz_import.Lib.Errors import ErrorsStatic
 
 
+class JsonStream:
+    """
+    Reads the top-level object of a json file from a binary stream.
+    Values of skipped keys are scanned over chunk by chunk, counting
+    brackets outside strings with numpy, so they are never decoded
+    and the text of the file is never held in memory as a whole.
+    """
+
+    chunkSize = 1 << 20
+    bom = codecs.BOM_UTF8
+    _whitespace = re.compile(rb'[ \t\n\r]*')
+    _string = re.compile(rb'"(?:[^"\\]|\\.)*"')
+    _scalar = re.compile(rb'[^,}\]\s]+')
+    _brackets = np.zeros(256, dtype=np.int8)
+    _brackets[[91, 123]] = 1
+    _brackets[[93, 125]] = -1
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buf = b""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.fp.read(self.chunkSize)
+        if not data:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, "", self.offset + self.pos)
+
+    def peek(self) -> bytes:
+        """Skip whitespace and return the next character, b'' at the end"""
+        while True:
+            self.pos = self._whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos+1]
+
+    def token(self, regex) -> bytes:
+        while True:
+            match = regex.match(self.buf, self.pos)
+            if match and match.end() < len(self.buf):
+                break
+            if not self.fill():
+                if match is None:
+                    raise self.error("Invalid token")
+                break
+        self.pos = match.end()
+        return match.group()
+
+    def load(self, skip) -> dict:
+        while len(self.buf) < len(self.bom) and self.fill():
+            pass
+        if self.buf.startswith(self.bom):
+            self.pos = len(self.bom)
+
+        if self.peek() != b"{":
+            while self.fill():
+                pass
+            return json.loads(self.buf[self.pos:])
+        self.pos += 1
+
+        data = {}
+        if self.peek() == b"}":
+            return data
+
+        while True:
+            if self.peek() != b'"':
+                raise self.error("Expecting property name enclosed in double quotes")
+            key = json.loads(self.token(self._string))
+            if self.peek() != b":":
+                raise self.error("Expecting ':' delimiter")
+            self.pos += 1
+
+            if key in skip:
+                self.value(False)
+            else:
+                data[key] = json.loads(self.value(True))
+
+            char = self.peek()
+            self.pos += 1
+            if char == b"}":
+                return data
+            elif char != b",":
+                raise self.error("Expecting ',' delimiter")
+
+    def value(self, keep: bool) -> bytes:
+        char = self.peek()
+        if char == b'"':
+            return self.token(self._string)
+        elif char in (b"[", b"{"):
+            return self.container(keep)
+        elif char:
+            return self.token(self._scalar)
+        raise self.error("Expecting value")
+
+    def container(self, keep: bool) -> bytes:
+        pieces = []
+        state = (0, False, False)
+        while True:
+            end, state = self.scan(self.buf, self.pos, *state)
+            if end >= 0:
+                if keep:
+                    pieces.append(self.buf[self.pos:end])
+                self.pos = end
+                return b"".join(pieces)
+            if keep:
+                pieces.append(self.buf[self.pos:])
+            self.pos = len(self.buf)
+            if not self.fill():
+                raise self.error("Unterminated value")
+
+    @staticmethod
+    def scan(buf: bytes, start: int, depth: int, inString: bool, escaped: bool):
+        """
+        End of the container that starts at depth 0, or -1 and the
+        state (depth, inString, escaped) at the end of buf.
+        """
+        chars = np.frombuffer(buf, dtype=np.uint8, offset=start)
+        if len(chars) == 0:
+            return -1, (depth, inString, escaped)
+
+        inString0 = inString
+        backslashes = (chars == 92)
+        if escaped or backslashes.any():
+            # Rare: follow escapes, visiting only quotes and backslashes
+            delims = []
+            esc = (0 if escaped else -1)
+            for idx in np.flatnonzero(backslashes | (chars == 34)).tolist():
+                if idx == esc:
+                    continue
+                elif chars[idx] == 92:
+                    if inString:
+                        esc = idx+1
+                else:
+                    delims.append(idx)
+                    inString = not inString
+            escaped = (esc == len(chars))
+        else:
+            delims = np.flatnonzero(chars == 34)
+            inString = (inString != (len(delims) % 2 == 1))
+
+        if len(delims) == 0 and inString0:
+            return -1, (depth, inString, escaped)
+
+        delta = JsonStream._brackets[chars]
+        if len(delims):
+            toggles = np.zeros(len(chars), dtype=np.int8)
+            toggles[delims] = 1
+            delta[(np.cumsum(toggles, dtype=np.int32) % 2 == 1) != inString0] = 0
+        depths = np.cumsum(delta, dtype=np.int32)
+        depths += depth
+        # Depth is positive inside the container, so the first zero ends it
+        ends = np.flatnonzero(depths == 0)
+        if len(ends):
+            return start + int(ends[0]) + 1, (0, False, False)
+        return -1, (int(depths[-1]), inString, escaped)
+
+
 class Json:
+
     @staticmethod
     def _safeOpen(filepath, rw: str, dirMustExist=False, fileMustExist=False, mustOpen=False):
         if dirMustExist:
@@ -46,7 +216,9 @@ class Json:
         return fp
 
     @classmethod
-    def load(cls, filepath: str, mustOpen=False):
+    def load(cls, filepath: str, mustOpen=False, skip=()):
+        if skip:
+            return cls.loadSkipping(filepath, mustOpen, skip)
 
         try:
             with gzip.open(filepath, 'rb') as file:
@@ -75,7 +247,7 @@ class Json:
 
             if file := cls._safeOpen(filepath, "r", mustOpen=mustOpen):
                 try:
-                    data = json.load(file)
+                    data = json.loads(file.read())
                     msg = None
                 except json.decoder.JSONDecodeError as err:
                     msg = ('JSON error while reading ascii file\n"%s"\n%s' %
@@ -90,6 +262,35 @@ class Json:
             # ErrorsStatic.report(msg, trigger=trigger)
         return data
 
+    @classmethod
+    def loadSkipping(cls, filepath: str, mustOpen: bool, skip) -> dict:
+        """Load a zipped or ascii file, without decoding the top-level keys in skip"""
+        data = {}
+        msg = None
+
+        try:
+            try:
+                with gzip.open(filepath, 'rb') as fp:
+                    data = JsonStream(fp).load(skip)
+            except gzip.BadGzipFile:
+                with open(filepath, 'rb') as fp:
+                    data = JsonStream(fp).load(skip)
+        except (json.decoder.JSONDecodeError, EOFError) as err:
+            msg = ('JSON error while reading file\n"%s"\n%s' %
+                   (filepath, err))
+        except UnicodeDecodeError as err:
+            msg = ('Unicode error while reading file\n"%s"\n%s' %
+                   (filepath, err))
+        except OSError:
+            msg = ("Could not load %s" % filepath)
+            if mustOpen:
+                raise FileNotFoundError(msg)
+
+        if msg:
+            print(msg)
+            data = {}
+        return data
+
     @classmethod
     def save(cls, struct, filepath, binary=False):
         if binary:
@@ -31,10 +31,16 @@ class SettingsClass(JsonObject):
         self.cloudDirs = []
         self.errorPath = Paths.path_fix("~/Documents/daz_importer_errors.txt")
         self.rootPath = Paths.path_fix("~/import-daz-paths.json")
+        self.assetCacheDir = Paths.path_fix("~/.cache/daz_import/assets")
+        self.pathIndexFile = Paths.path_fix("~/.cache/daz_import/paths.pickle")
+        self.morphCatalogFile = Paths.path_fix("~/.cache/daz_import/morphs.pickle")
+        self.transferCacheDir = Paths.path_fix("~/.cache/daz_import/transfer")
+        self.morphReportFile = Paths.path_fix("~/Documents/daz_morph_report.json")
 
         self.unitScale = 0.01
         self.verbosity = 2
         self.useDump = False
+        self.useMorphReport = False
         self.zup = True
         self.unflipped = False
         self.useMakeHiddenSliders = False
@@ -47,6 +53,15 @@ class SettingsClass(JsonObject):
 
         self.useQuaternions = False
         self.caseSensitivePaths = (platform != 'win32')
+        self.usePathIndex = False
+        self.useMorphCatalog = True
+        self.useSkipLibraries = True
+        self.useAssetCache = False
+        self.assetCacheSize = 2048
+        self.usePrefetch = False
+        self.prefetchThreads = 4
+        self.useTransferCache = True
+        self.transferCacheSize = 512
         self.mergeShells = True
         self.pruneNodes = True
 
@@ -76,6 +91,9 @@ class SettingsClass(JsonObject):
         self.useERC = False
         self.useStripCategory = False
         self.useModifiedMesh = False
+        self.useCompactDrivers = True
+        self.useMorphBank = False
+        self.useIncrementalMorphs = False
 
         self.useLockLoc = True
         self.useLimitLoc = True
@@ -217,8 +235,13 @@ class SettingsClass(JsonObject):
     def reset(self):
         from daz_import.Elements.Assets import Assets
         from daz_import.Collection import Collection
+        from daz_import.Lib.Files.AssetPrefetch import AssetPrefetch
+        from daz_import.Elements.Modifier import MeshArrays, MorphBaker
 
         self.theTrace_ = []
+        AssetPrefetch.clear()
+        MeshArrays.clear()
+        MorphBaker.clear()
         Assets.clear()
         Collection.update()
 
@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Tuple
+from mathutils.kdtree import KDTree
+from mathutils.bvhtree import BVHTree
+
+
+class SpatialIndex:
+    @staticmethod
+    def coords(ob) -> np.ndarray:
+        """Vertex coordinates of a mesh object as an (n, 3) array"""
+        verts = ob.data.vertices
+        co = np.empty(3*len(verts), dtype=np.float32)
+        verts.foreach_get("co", co)
+        return co.reshape(-1, 3).astype(np.float64)
+
+    @staticmethod
+    def weights(ob, vgname) -> np.ndarray:
+        """Weights of the vertex group vgname as an (n,) array, zero outside the group"""
+        idx = ob.vertex_groups[vgname].index
+        # Deform weights have no foreach accessor, so gather them in one pass
+        pairs = np.array([(v.index, g.weight)
+                          for v in ob.data.vertices
+                          for g in v.groups if g.group == idx],
+                         dtype=np.float64).reshape(-1, 2)
+        weights = np.zeros(len(ob.data.vertices), dtype=np.float64)
+        weights[pairs[:, 0].astype(np.int64)] = pairs[:, 1]
+        return weights
+
+    @staticmethod
+    def triangles(ob) -> np.ndarray:
+        """Vertex numbers of a triangulated mesh as an (n, 3) array"""
+        polys = ob.data.polygons
+        tris = np.empty(3*len(polys), dtype=np.int32)
+        polys.foreach_get("vertices", tris)
+        return tris.reshape(-1, 3)
+
+
+class VertexIndex:
+    """KD-tree over a set of points, for batched nearest vertex queries"""
+
+    def __init__(self, coords: np.ndarray):
+        self.tree = KDTree(len(coords))
+        for vn, co in enumerate(coords):
+            self.tree.insert(co, vn)
+        self.tree.balance()
+
+    def nearest(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Index of and distance to the nearest vertex of each point"""
+        find = self.tree.find
+        idxs = np.empty(len(points), dtype=np.int64)
+        dists = np.empty(len(points), dtype=np.float64)
+        for n, co in enumerate(points):
+            _, idxs[n], dists[n] = find(co)
+        return idxs, dists
+
+
+class TriangleIndex:
+    """BVH over the triangles of a mesh, for batched nearest face queries"""
+
+    def __init__(self, verts: np.ndarray, tris: np.ndarray):
+        self.tree = BVHTree.FromPolygons(
+            verts.tolist(), tris.tolist(), all_triangles=True)
+
+    def nearest(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Closest location on and index of the nearest triangle of each point"""
+        find = self.tree.find_nearest
+        locs = np.empty((len(points), 3), dtype=np.float64)
+        fnums = np.empty(len(points), dtype=np.int64)
+        for n, co in enumerate(points):
+            loc, _, fnums[n], _ = find(co)
+            locs[n] = loc
+        return locs, fnums
@@ -4,4 +4,5 @@ from .Errors import __doc__
 from .VectorStatic import VectorStatic
 from .BlenderStatic import BlenderStatic
 from .BlenderObjectStatic import BlenderObjectStatic
+from .BlenderMeshStatic import BlenderMeshStatic
 from .Files.Json import Json
@@ -112,6 +112,8 @@ class DAZ_PT_SetupMorphs(DAZ_PT_Base, bpy.types.Panel):
             self.layout.operator("daz.transfer_shapekeys")
             self.layout.operator("daz.apply_all_shapekeys")
             self.layout.operator("daz.mix_shapekeys")
+            self.layout.operator("daz.prune_shapekeys")
+            self.layout.operator("daz.materialize_morphs")
 
 
 @Registrar()
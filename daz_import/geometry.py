@@ -2,6 +2,7 @@ from __future__ import annotations
 import os
 
 import math
+import numpy as np
 from mathutils import Vector
 from urllib.parse import unquote
 import bpy
@@ -18,6 +19,7 @@ from daz_import.Lib.Settings import Settings
 from daz_import.Elements.Node import Node
 from daz_import.Lib.Files import SingleFile, DazFile
 from daz_import.Lib.BlenderStatic import BlenderStatic
+from daz_import.Lib.BlenderMeshStatic import BlenderMeshStatic
 from daz_import.Lib.VectorStatic import VectorStatic
 from daz_import.Lib.Utility import UtilityStatic
 
@@ -176,11 +178,9 @@ class GeoNode(Node):
         me = bpy.data.meshes.new(ob.data.name + "_HD")
         print("Build HD mesh for %s: %d verts, %d faces" %
               (ob.name, nverts, len(faces)))
-        me.from_pydata(verts, [], faces)
+        BlenderMeshStatic.build(me, verts, [], faces)
         print("HD mesh %s built" % me.name)
-        for f in me.polygons:
-            f.material_index = mnums[f.index]
-            f.use_smooth = True
+        BlenderMeshStatic.set_materials(me, mnums)
         return me
 
     def addHDUvs(self, ob, hdob):
@@ -487,12 +487,12 @@ class Geometry(Asset):
 
         self.instances = self.nodes = {}
 
-        self.verts = []
-        self.faces = []
+        self.verts = np.zeros((0, 3), dtype=np.float32)
+        self.faces = Polygons()
         self.polylines = []
         self.strands = []
-        self.polygon_indices = []
-        self.material_indices = []
+        self.polygon_indices = np.zeros(0, dtype=np.int32)
+        self.material_indices = np.zeros(0, dtype=np.int16)
         self.polygon_material_groups = []
         self.polygon_groups = []
         self.edge_weights = []
@@ -537,12 +537,14 @@ class Geometry(Asset):
         super().parse(struct)
         self.channelsData.parse(struct)
 
-        self.verts = d2bList(struct["vertices"]["values"])
+        self.verts = d2bArray(struct["vertices"]["values"])
         fdata = struct["polylist"]["values"]
-        self.faces = [f[2:] for f in fdata]
-        self.polygon_indices = [f[0] for f in fdata]
+        self.faces = Polygons.from_polylist(fdata, 2)
+        self.polygon_indices = np.fromiter(
+            (f[0] for f in fdata), dtype=np.int32, count=len(fdata))
         self.polygon_groups = struct["polygon_groups"]["values"]
-        self.material_indices = [f[1] for f in fdata]
+        self.material_indices = np.fromiter(
+            (f[1] for f in fdata), dtype=np.int16, count=len(fdata))
         self.polygon_material_groups = struct["polygon_material_groups"]["values"]
 
         for key, data in struct.items():
@@ -623,8 +625,8 @@ class Geometry(Asset):
                 alt = self.mappings[pgrp]
                 if alt in polyidxs.keys():
                     hideidxs[polyidxs[alt]] = True
-        return [fn for fn, idx in enumerate(self.polygon_indices)
-                if idx in hideidxs.keys()]
+        hidden = np.isin(self.polygon_indices, list(hideidxs.keys()))
+        return np.flatnonzero(hidden).tolist()
 
     def hidePolyGroup(self, ob, fnums):
         if not fnums:
@@ -804,7 +806,7 @@ class Geometry(Asset):
         edges = []
         faces = self.faces
 
-        if isinstance(geonode, GeoNode) and geonode.verts:
+        if isinstance(geonode, GeoNode) and geonode.verts is not None and len(geonode.verts):
             if geonode.edges:
                 verts = geonode.verts
                 edges = geonode.edges
@@ -816,7 +818,7 @@ class Geometry(Asset):
             elif len(geonode.verts) == len(verts):
                 verts = geonode.verts
 
-        if not verts:
+        if len(verts) == 0:
             self.addAllMaterials(me, geonode)
             return None
 
@@ -825,13 +827,13 @@ class Geometry(Asset):
                 edges += [(pline[i-1], pline[i]) for i in range(3, len(pline))]
                 pn = pline[0]
                 mn = pline[1]
-                lverts = [verts[vn] for vn in pline[2:]]
+                lverts = verts[pline[2:]].tolist()
                 self.strands.append((pn, mn, lverts))
 
         if Settings.fitFile_:
-            me.from_pydata(verts, edges, faces)
+            BlenderMeshStatic.build(me, verts, edges, faces)
         else:
-            me.from_pydata([Vector(vco)-center for vco in verts], edges, faces)
+            BlenderMeshStatic.build(me, verts, edges, faces, offset=center)
 
         if len(faces) != len(me.polygons):
             msg = ("Not all faces were created:\n" +
@@ -840,11 +842,7 @@ class Geometry(Asset):
                    "\# Blender polygons: %d\n" % len(me.polygons))
             ErrorsStatic.report(msg, trigger=(2, 3))
 
-        if len(me.polygons) > 0:
-            for fn, mn in enumerate(self.material_indices):
-                f = me.polygons[fn]
-                f.material_index = mn
-                f.use_smooth = True
+        BlenderMeshStatic.set_materials(me, self.material_indices)
 
         if self.polylines:
             me.DazMatNums.clear()
@@ -1019,12 +1017,53 @@ class Geometry(Asset):
         return shell
 
 
-def d2bList(verts):
-    s = Settings.scale_
+def d2bArray(verts) -> np.ndarray:
+    co = np.array(verts, dtype=np.float32).reshape(-1, 3)
+    co *= Settings.scale_
     if Settings.zup:
-        return [[s*v[0], -s*v[2], s*v[1]] for v in verts]
-    else:
-        return [[s*v[0], s*v[1], s*v[2]] for v in verts]
+        co[:, [1, 2]] = co[:, [2, 1]]
+        co[:, 1] *= -1
+    return co
+
+
+class Polygons:
+    """
+    Faces stored as flat vertex indices with offsets, so that
+    faces[fn] = indices[offsets[fn]:offsets[fn+1]]
+    """
+
+    def __init__(self, offsets=None, indices=None):
+        if offsets is None:
+            offsets = np.zeros(1, dtype=np.int32)
+        if indices is None:
+            indices = np.zeros(0, dtype=np.int32)
+        self.offsets = offsets
+        self.indices = indices
+
+    @classmethod
+    def from_polylist(cls, fdata, first=0) -> Polygons:
+        nfaces = len(fdata)
+        offsets = np.zeros(nfaces+1, dtype=np.int32)
+        if nfaces:
+            np.cumsum(np.fromiter((len(f)-first for f in fdata),
+                                  dtype=np.int32, count=nfaces), out=offsets[1:])
+        indices = np.fromiter((vn for f in fdata for vn in f[first:]),
+                              dtype=np.int32, count=int(offsets[-1]))
+        return cls(offsets, indices)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, fn):
+        return self.indices[self.offsets[fn]:self.offsets[fn+1]]
+
+    def __iter__(self):
+        offsets = self.offsets.tolist()
+        for first, last in zip(offsets[:-1], offsets[1:]):
+            yield self.indices[first:last]
 
 # -------------------------------------------------------------
 #   Shell
@@ -1055,7 +1094,7 @@ class Uvset(Asset):
     def __init__(self, fileref):
         super().__init__(fileref)
 
-        self.uvs = []
+        self.uvs = np.zeros((0, 2), dtype=np.float32)
         self.polyverts = []
         self.material = None
         self.built = []
@@ -1066,7 +1105,8 @@ class Uvset(Asset):
     def parse(self, struct):
         super().parse(struct)
         self.type = "uv_set"
-        self.uvs = struct["uvs"]["values"]
+        self.uvs = np.array(struct["uvs"]["values"],
+                            dtype=np.float32).reshape(-1, 2)
         self.polyverts = struct["polygon_vertex_indices"]
         self.name = self.getLabel()
         return self
@@ -1074,17 +1114,12 @@ class Uvset(Asset):
     def checkSize(self, me):
         if not self.polyverts:
             return True
-        fnums = [pvi[0] for pvi in self.polyverts]
-        fnums.sort()
-        return (len(me.polygons) >= fnums[-1])
-
-    def checkPolyverts(self, me, polyverts, error):
-        uvnums = []
-        for fverts in polyverts.values():
-            uvnums += fverts
-        if uvnums:
-            uvmin = min(uvnums)
-            uvmax = max(uvnums) + 1
+        return (len(me.polygons) >= max(pvi[0] for pvi in self.polyverts))
+
+    def checkPolyverts(self, me, uvnums, error):
+        if len(uvnums):
+            uvmin = int(uvnums.min())
+            uvmax = int(uvnums.max()) + 1
         else:
             uvmin = uvmax = -1
         if (uvmin != 0 or uvmax != len(self.uvs)):
@@ -1097,14 +1132,39 @@ class Uvset(Asset):
                 print(msg)
 
     def getPolyVerts(self, me):
-        polyverts = dict([(f.index, list(f.vertices)) for f in me.polygons])
+        """
+        Return the UV vertex number of each loop, and the polygon of
+        each loop. Loops use the mesh vertex number unless overridden by
+        polygon_vertex_indices.
+        """
+        loopvns, looppolys = BlenderMeshStatic.loop_polygons(me)
+        uvnums = loopvns.astype(np.int64)
+
         if self.polyverts:
-            for fn, vn, uv in self.polyverts:
-                f = me.polygons[fn]
-                for n, vn1 in enumerate(f.vertices):
-                    if vn1 == vn:
-                        polyverts[fn][n] = uv
-        return polyverts
+            pvs = np.asarray(self.polyverts, dtype=np.int64).reshape(-1, 3)
+            nverts = max(len(me.vertices), int(pvs[:, 1].max()) + 1)
+            # Later entries override earlier ones
+            pvs = pvs[::-1]
+            keys, firsts = np.unique(pvs[:, 0]*nverts + pvs[:, 1],
+                                     return_index=True)
+            values = pvs[firsts, 2]
+
+            loopkeys = looppolys.astype(np.int64)*nverts + loopvns
+            pos = np.minimum(np.searchsorted(keys, loopkeys), len(keys)-1)
+            hit = (keys[pos] == loopkeys)
+            uvnums[hit] = values[pos[hit]]
+
+        return uvnums, looppolys
+
+    def setLoopUvs(self, uvloop, uvnums):
+        valid = (uvnums < len(self.uvs))
+        # Loops with invalid uv numbers keep the uvs they already have
+        uvs = np.empty(2*len(uvnums), dtype=np.float32)
+        uvloop.data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)
+        uvs[valid] = self.uvs[uvnums[valid]]
+        uvloop.data.foreach_set("uv", uvs.ravel())
+        return uvs, valid
 
     def build(self, context, me, geo, setActive):
         if self.name is None or me in self.built:
@@ -1113,36 +1173,41 @@ class Uvset(Asset):
             print("NO UVs", me.name, self.name)
             return
 
-        polyverts = self.getPolyVerts(me)
-        self.checkPolyverts(me, polyverts, False)
+        uvnums, looppolys = self.getPolyVerts(me)
+        self.checkPolyverts(me, uvnums, False)
         uvloop = makeNewUvloop(me, self.getLabel(), setActive)
+        uvs, valid = self.setLoopUvs(uvloop, uvnums)
 
-        m = 0
-        vnmax = len(self.uvs)
+        npolys = len(me.polygons)
         nmats = len(geo.polygon_material_groups)
-        ucoords = [[] for n in range(nmats)]
-        for fn, f in enumerate(me.polygons):
-            mn = geo.material_indices[fn]
-            for n in range(len(f.vertices)):
-                vn = polyverts[f.index][n]
-                if vn < vnmax:
-                    uv = self.uvs[vn]
-                    uvloop.data[m].uv = uv
-                    ucoords[mn].append(uv[0])
-                m += 1
+        mnums = np.zeros(npolys, dtype=np.int32)
+        n = min(npolys, len(geo.material_indices))
+        mnums[:n] = geo.material_indices[:n]
+
+        loopmats = mnums[looppolys][valid]
+        ucoords = uvs[valid, 0]
+        if len(loopmats) == 0:
+            self.built.append(me)
+            return
 
-        for mn in range(nmats):
-            if len(ucoords[mn]) > 0:
-                umin = min(ucoords[mn])
-                umax = max(ucoords[mn])
-                if umax-umin <= 1:
-                    udim = math.floor((umin+umax)/2)
-                else:
-                    udim = 0
-                    if Settings.verbosity > 2:
-                        print("UV coordinate difference %f - %f > 1" %
-                              (umax, umin))
-                self.fixUdims(context, mn, udim, geo)
+        order = np.argsort(loopmats, kind="stable")
+        loopmats = loopmats[order]
+        ucoords = ucoords[order]
+        mats, firsts = np.unique(loopmats, return_index=True)
+        umins = np.minimum.reduceat(ucoords, firsts)
+        umaxs = np.maximum.reduceat(ucoords, firsts)
+
+        for mn, umin, umax in zip(mats.tolist(), umins.tolist(), umaxs.tolist()):
+            if mn >= nmats:
+                continue
+            if umax-umin <= 1:
+                udim = math.floor((umin+umax)/2)
+            else:
+                udim = 0
+                if Settings.verbosity > 2:
+                    print("UV coordinate difference %f - %f > 1" %
+                          (umax, umin))
+            self.fixUdims(context, mn, udim, geo)
         self.built.append(me)
 
     def fixUdims(self, context, mn, udim, geo):
@@ -1168,14 +1233,12 @@ def makeNewUvloop(me, name, setActive):
 
 
 def addUvs(me, name, uvs, uvfaces):
-    if not uvs:
+    if len(uvs) == 0:
         return
     uvloop = makeNewUvloop(me, name, True)
-    m = 0
-    for f in uvfaces:
-        for vn in f:
-            uvloop.data[m].uv = uvs[vn]
-            m += 1
+    uvnums = BlenderMeshStatic.face_arrays(uvfaces)[0]
+    uvs = np.asarray(uvs, dtype=np.float32).reshape(-1, 2)
+    uvloop.data.foreach_set("uv", uvs[uvnums].ravel())
 
 # -------------------------------------------------------------
 #   Prune Uv textures
@@ -1368,18 +1431,10 @@ class DAZ_OT_LoadUV(DazOperator, DazFile, SingleFile, IsMesh):
             raise DazError("Not an UV asset:\n  '%s'" % self.filepath)
 
         for uvset in asset.uvs:
-            polyverts = uvset.getPolyVerts(me)
-            uvset.checkPolyverts(me, polyverts, True)
+            uvnums, _ = uvset.getPolyVerts(me)
+            uvset.checkPolyverts(me, uvnums, True)
             uvloop = makeNewUvloop(me, uvset.getLabel(), False)
-            vnmax = len(uvset.uvs)
-            m = 0
-            for fn, f in enumerate(me.polygons):
-                for n in range(len(f.vertices)):
-                    vn = polyverts[f.index][n]
-                    if vn < vnmax:
-                        uv = uvset.uvs[vn]
-                        uvloop.data[m].uv = uv
-                    m += 1
+            uvset.setLoopUvs(uvloop, uvnums)
 
 # ----------------------------------------------------------
 #   Prune vertex groups
@@ -1,11 +1,15 @@
 import os
 import bpy
+import pickle
+import hashlib
 import numpy as np
 from time import perf_counter
 from daz_import.Lib.Settings import Settings, Settings, Settings
 from daz_import.Elements.Morph import JCMSelector
 from daz_import.driver import DriverUser
 from daz_import.Lib import Registrar
+from daz_import.Lib.SpatialIndex import SpatialIndex, VertexIndex, TriangleIndex
+from daz_import.Lib.Settings.Paths import Paths
 
 from daz_import.Lib.Errors import *
 from daz_import.utils import *
@@ -73,24 +77,305 @@ class FastMatcher:
         return objects
 
     def findTriangles(self, ob):
-        self.verts = np.array([list(v.co) for v in ob.data.vertices])
-        tris = [f.vertices for f in ob.data.polygons]
-        self.tris = np.array(tris)
+        self.verts = SpatialIndex.coords(ob)
+        self.tris = SpatialIndex.triangles(ob)
+        self.triIndex = TriangleIndex(self.verts, self.tris)
 
     def findMatchNearest(self, src, trg):
-        closest = [(v.co, src.closest_point_on_mesh(v.co))
-                   for v in trg.data.vertices]
-        # (result, location, normal, index)
-        cverts = np.array([list(x) for x, data in closest if data[0]])
-        offsets = np.array([list(x-data[1]) for x, data in closest if data[0]])
-        fnums = [data[3] for x, data in closest if data[0]]
+        cverts = SpatialIndex.coords(trg)
+        locs, fnums = self.triIndex.nearest(cverts)
+        offsets = cverts - locs
         tris = self.tris[fnums]
         tverts = self.verts[tris]
         A = np.transpose(tverts, axes=(0, 2, 1))
-        B = cverts - offsets
-        w = np.linalg.solve(A, B)
+        w = np.linalg.solve(A, locs[:, :, None])[:, :, 0]
         self.match = (tris, w, offsets)
 
+# ----------------------------------------------------------
+#   Match cache
+# ----------------------------------------------------------
+
+
+class MatchCache:
+    """
+    Matching tables of shapekey transfer, kept in memory and on disk.
+    Entries are keyed by the transfer method and by hashes of the
+    source and target geometry, so any change of vertex positions or
+    faces gives a new key. The tables in memory only live for one
+    transfer, and the folder is kept below transferCacheSize.
+    """
+
+    extension = ".pickle"
+    tables = {}
+    _total = None
+
+    @staticmethod
+    def folder() -> str:
+        return Paths.path_fix(Settings.transferCacheDir)
+
+    @staticmethod
+    def limit() -> int:
+        return int(Settings.transferCacheSize) * 1024 * 1024
+
+    @staticmethod
+    def geometry(ob) -> str:
+        from daz_import.Elements.Finger import getFingerPrint
+        me = ob.data
+        co = np.empty(3*len(me.vertices), dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        loops = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("vertex_index", loops)
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(getFingerPrint(ob).encode("utf_8"))
+        hasher.update(co.tobytes())
+        hasher.update(loops.tobytes())
+        return hasher.hexdigest()
+
+    @classmethod
+    def key(cls, method: str, src, trg) -> str:
+        if not Settings.useTransferCache:
+            return None
+        string = "%s %g %s %s" % (method, src.DazScale,
+                                  cls.geometry(src), cls.geometry(trg))
+        return hashlib.sha1(string.encode("utf_8")).hexdigest()
+
+    @classmethod
+    def entry_path(cls, key: str) -> str:
+        return os.path.join(cls.folder(), key + cls.extension)
+
+    @classmethod
+    def get(cls, key: str):
+        if key is None:
+            return None
+        if key not in cls.tables:
+            entry = cls.entry_path(key)
+            try:
+                with open(entry, "rb") as fp:
+                    cls.tables[key] = pickle.load(fp)
+            except (OSError, EOFError, ValueError, TypeError,
+                    AttributeError, pickle.UnpicklingError):
+                return None
+            # Touch the entry so eviction is least recently used
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+        return cls.decode(cls.tables[key])
+
+    @classmethod
+    def put(cls, key: str, match) -> None:
+        if key is None:
+            return
+        cls.tables[key] = data = cls.encode(match)
+        try:
+            bytes_ = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, RecursionError):
+            return
+        if len(bytes_) > cls.limit():
+            return
+
+        entry = cls.entry_path(key)
+        old = os.path.getsize(entry) if os.path.exists(entry) else 0
+        total = cls.size() - old + len(bytes_)
+        try:
+            Paths.mkdir_parent(entry)
+            with open(entry + ".tmp", "wb") as fp:
+                fp.write(bytes_)
+            os.replace(entry + ".tmp", entry)
+        except OSError as err:
+            print("Could not write transfer cache entry %s: %s" % (entry, err))
+            return
+
+        cls._total = total
+        if total > cls.limit():
+            cls.evict()
+
+    @staticmethod
+    def encode(match):
+        if isinstance(match, tuple):
+            return ("faces",) + match
+        pairs = np.array([(cvn, hvn) for cvn, hvn, _ in match],
+                         dtype=np.int64).reshape(-1, 2)
+        offsets = np.array([tuple(offset) for _, _, offset in match],
+                           dtype=np.float64).reshape(-1, 3)
+        return ("pairs", pairs, offsets)
+
+    @staticmethod
+    def decode(data):
+        if data[0] == "faces":
+            return data[1:]
+        _, pairs, offsets = data
+        return [(cvn, hvn, Vector(offset))
+                for (cvn, hvn), offset in zip(pairs.tolist(), offsets)]
+
+    @classmethod
+    def _entries(cls):
+        folder = cls.folder()
+        if not os.path.isdir(folder):
+            return
+        for file in os.scandir(folder):
+            if file.name.endswith(cls.extension):
+                yield file
+
+    @classmethod
+    def size(cls) -> int:
+        if cls._total is None:
+            cls._total = sum(file.stat().st_size for file in cls._entries())
+        return cls._total
+
+    @classmethod
+    def evict(cls, limit: int = None) -> None:
+        if limit is None:
+            limit = cls.limit()
+        entries = [(file.stat().st_mtime, file.stat().st_size, file.path)
+                   for file in cls._entries()]
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% of the limit, so that we don't evict on every write
+        target = int(limit * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        cls._total = total
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.tables = {}
+
+    @classmethod
+    def purge(cls) -> None:
+        cls.clear()
+        cls.evict(limit=0)
+
+# ----------------------------------------------------------
+#   Morph bounds
+# ----------------------------------------------------------
+
+
+class MorphBounds:
+    """
+    Axis-aligned bounds of the vertices moved by each shapekey of a
+    mesh, computed in one pass. A morph can only affect a target mesh
+    whose bounds overlap the bounds of the morph.
+    """
+
+    def __init__(self, ob, snames, eps):
+        skeys = ob.data.shape_keys.key_blocks
+        verts = SpatialIndex.coords(ob).astype(np.float32)
+        co = np.empty(verts.size, dtype=np.float32)
+        self.bounds = {}
+        for sname in snames:
+            if sname not in skeys.keys():
+                continue
+            skeys[sname].data.foreach_get("co", co)
+            delta = co.reshape(-1, 3) - verts
+            moved = np.einsum("ij,ij->i", delta, delta) > eps*eps
+            if moved.any():
+                mverts = verts[moved]
+                self.bounds[sname] = (mverts.min(axis=0), mverts.max(axis=0))
+            else:
+                self.bounds[sname] = None
+
+    def get(self, sname):
+        return self.bounds.get(sname)
+
+    @staticmethod
+    def meshBounds(ob):
+        verts = SpatialIndex.coords(ob)
+        if len(verts) == 0:
+            return None
+        return (verts.min(axis=0), verts.max(axis=0))
+
+# ----------------------------------------------------------
+#   Rigidity
+# ----------------------------------------------------------
+
+
+class Rigidity:
+    """
+    Rigidity weights and rigidity groups of a mesh, read once into
+    arrays and applied to many shapekeys at once.
+    """
+
+    def __init__(self, ob):
+        self.verts = SpatialIndex.coords(ob)
+        self.factors = None
+        if "Rigidity" in ob.vertex_groups.keys():
+            self.factors = 1 - SpatialIndex.weights(ob, "Rigidity")
+
+        self.groups = []
+        for rgroup in ob.data.DazRigidityGroups:
+            refverts = np.array([elt.a for elt in rgroup.reference_vertices],
+                                dtype=np.int64)
+            if len(refverts) == 0:
+                continue
+            maskverts = np.array([elt.a for elt in rgroup.mask_vertices],
+                                 dtype=np.int64)
+            scalemodes = rgroup.scale_modes.split(" ")
+            scaled = np.array([n < len(scalemodes) and scalemodes[n] == "primary"
+                               for n in range(3)])
+            # Only full rotation is fitted. DAZ also constrains the rotation
+            # to the primary or secondary axis, which is approximated here
+            # by not rotating at all, as before.
+            rotmode = rgroup.rotation_mode
+            rotate = (rotmode == "full")
+            if rotmode not in ["", "none", "full"]:
+                print("Rigidity rotation mode %s approximated by none in %s"
+                      % (rotmode, rgroup.id))
+            self.groups.append((rotate, scaled, refverts, maskverts))
+
+    def isEmpty(self) -> bool:
+        return (self.factors is None and not self.groups)
+
+    def apply(self, coords: np.ndarray) -> np.ndarray:
+        """Correct the (K, N, 3) coordinates of K shapekeys"""
+        verts = self.verts
+        if self.factors is not None:
+            coords = verts + self.factors[:, None]*(coords - verts)
+
+        for rotate, scaled, refverts, maskverts in self.groups:
+            xref = verts[refverts]
+            xcenter = xref.mean(axis=0)
+            xrel = xref - xcenter
+            yref = coords[:, refverts]
+            ycenter = yref.mean(axis=1)
+            yrel = yref - ycenter[:, None]
+
+            xdim = np.abs(xrel).sum()
+            ydim = np.abs(yrel).sum(axis=(1, 2))
+            keys = np.nonzero(ydim > 0)[0]
+            if xdim == 0 or len(keys) < len(ydim):
+                print("Rigidity division by zero")
+            if xdim == 0 or len(keys) == 0:
+                continue
+
+            scale = ydim[keys]/xdim
+            smat = np.where(scaled, scale[:, None], 1.0)
+            ymask = (verts[maskverts] - xcenter)[None] * smat[:, None]
+            if rotate:
+                rmat = self.bestRotation(xrel, yrel[keys])
+                ymask = np.einsum("kcd,kmd->kmc", rmat, ymask)
+            coords[keys[:, None], maskverts[None]] = ymask + ycenter[keys, None]
+
+        return coords
+
+    @staticmethod
+    def bestRotation(xrel: np.ndarray, yrel: np.ndarray) -> np.ndarray:
+        """Rotations that best map the points xrel to each set in yrel"""
+        cov = np.einsum("rc,krd->kcd", xrel, yrel)
+        u, _, vt = np.linalg.svd(cov)
+        rmat = np.einsum("kcd,kec->kde", vt, u)
+        flip = np.linalg.det(rmat) < 0
+        if flip.any():
+            vt[flip, 2] *= -1
+            rmat = np.einsum("kcd,kec->kde", vt, u)
+        return rmat
+
 # ----------------------------------------------------------
 #   Threshold
 # ----------------------------------------------------------
@@ -255,6 +540,7 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
         finally:
             self.deleteTmp()
             self.restore(context, src, data)
+            MatchCache.clear()
         t2 = perf_counter()
         print("Morphs transferred in %.1f seconds" % (t2-t1))
         if failed:
@@ -266,8 +552,10 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
             raise DazError(msg)
 
     def transferAllMorphs(self, context, src, targets):
-        if self.transferMethod == 'NEAREST':
-            self.findTriangles(self.trihuman)
+        self.triIndex = None
+        self.morphBounds = None
+        self.meshBounds = {}
+        self.rigidity = {}
         failed = []
         for trg in targets:
             if not self.transferMorphs(src, trg, context):
@@ -282,6 +570,15 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
         scn = context.scene
         Collection.update()
         BlenderStatic.activate(context, src)
+        hskeys = src.data.shape_keys
+        snames = self.getSelectedProps()
+        nskeys = len(snames)
+        ignored = self.findIgnored(src, trg, snames)
+        if not [sname for sname in snames
+                if sname in hskeys.key_blocks.keys() and sname not in ignored]:
+            print("No morphs affect %s" % trg.name)
+            return True
+
         if not self.findMatch(src, trg):
             return False
         trg.select_set(True)
@@ -289,14 +586,14 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
             basic = trg.shape_key_add(name="Basic")
         else:
             basic = None
-        hskeys = src.data.shape_keys
         cskeys = trg.data.shape_keys
         if src.active_shape_key_index < 0:
             src.active_shape_key_index = 0
         trg.active_shape_key_index = 0
 
-        snames = self.getSelectedProps()
-        nskeys = len(snames)
+        self.startBatch(hskeys, [sname for sname in snames
+                                 if sname not in ignored])
+        rigid = []
         for idx, sname in enumerate(snames):
             Progress.show(idx, nskeys)
             if sname not in hskeys.key_blocks.keys():
@@ -309,7 +606,7 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
             else:
                 fcu = None
 
-            if self.ignoreMorph(src, trg, hskey):
+            if sname in ignored:
                 print(" 0", sname)
                 continue
 
@@ -330,7 +627,7 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
                 cskey = cskeys.key_blocks[sname]
                 print(" +", sname)
                 if cskey and not self.ignoreRigidity:
-                    self.correctForRigidity(trg, cskey)
+                    rigid.append(cskey.name)
 
             if cskey:
                 cskey.slider_min = hskey.slider_min
@@ -350,6 +647,9 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
             else:
                 print(" -", sname)
 
+        if rigid:
+            self.correctForRigidity(trg, rigid)
+
         if (basic and
             len(trg.data.shape_keys.key_blocks) == 1 and
                 trg.data.shape_keys.key_blocks[0] == basic):
@@ -377,76 +677,44 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
         else:
             return None
 
-    def correctForRigidity(self, ob, skey):
-        from mathutils import Matrix
-
-        if "Rigidity" in ob.vertex_groups.keys():
-            idx = ob.vertex_groups["Rigidity"].index
-            for v in ob.data.vertices:
-                for g in v.groups:
-                    if g.group == idx:
-                        x = skey.data[v.index]
-                        x.co = v.co + (1 - g.weight)*(x.co - v.co)
-
-        for rgroup in ob.data.DazRigidityGroups:
-            rotmode = rgroup.rotation_mode
-            scalemodes = rgroup.scale_modes.split(" ")
-            maskverts = [elt.a for elt in rgroup.mask_vertices]
-            refverts = [elt.a for elt in rgroup.reference_vertices]
-            nrefverts = len(refverts)
-            if nrefverts == 0:
-                continue
+    def correctForRigidity(self, ob, snames):
+        if ob.name not in self.rigidity:
+            self.rigidity[ob.name] = Rigidity(ob)
+        rigidity = self.rigidity[ob.name]
+        if rigidity.isEmpty():
+            return
 
-            if rotmode != "none":
-                raise RuntimeError(
-                    "Not yet implemented: Rigidity rotmode = %s" % rotmode)
-
-            xcoords = [ob.data.vertices[vn].co for vn in refverts]
-            ycoords = [skey.data[vn].co for vn in refverts]
-            xsum = Vector((0, 0, 0))
-            ysum = Vector((0, 0, 0))
-            for co in xcoords:
-                xsum += co
-            for co in ycoords:
-                ysum += co
-            xcenter = xsum/nrefverts
-            ycenter = ysum/nrefverts
-
-            xdim = ydim = 0
-            for n in range(3):
-                xs = [abs(co[n]-xcenter[n]) for co in xcoords]
-                ys = [abs(co[n]-ycenter[n]) for co in ycoords]
-                xdim += sum(xs)
-                ydim += sum(ys)
-            if xdim == 0 or ydim == 0:
-                print("Rigidity division by zero")
-                continue
-            scale = ydim/xdim
-            smat = Matrix.Identity(3)
-            for n, smode in enumerate(scalemodes):
-                if smode == "primary":
-                    smat[n][n] = scale
-
-            for n, vn in enumerate(maskverts):
-                skey.data[vn].co = smat @ (ob.data.vertices[vn].co -
-                                           xcenter) + ycenter
-
-    def ignoreMorph(self, src, trg, hskey):
-        eps = 0.01 * src.DazScale   # 0.1 mm
-        hverts = [v.index for v in src.data.vertices if (
-            hskey.data[v.index].co - v.co).length > eps]
-        for j in range(3):
-            xclo = [v.co[j] for v in trg.data.vertices]
-            # xkey = [hskey.data[vn].co[j] for vn in hverts]
-            xkey = [src.data.vertices[vn].co[j] for vn in hverts]
-            if xclo and xkey:
-                minclo = min(xclo)
-                maxclo = max(xclo)
-                minkey = min(xkey)
-                maxkey = max(xkey)
-                if minclo > maxkey or maxclo < minkey:
-                    return True
-        return False
+        skeys = ob.data.shape_keys.key_blocks
+        nverts = len(ob.data.vertices)
+        nkeys = max(1, self.batchLimit // max(1, 3*nverts))
+        for first in range(0, len(snames), nkeys):
+            chunk = snames[first:first+nkeys]
+            coords = np.empty((len(chunk), 3*nverts), dtype=np.float32)
+            for k, sname in enumerate(chunk):
+                skeys[sname].data.foreach_get("co", coords[k])
+            coords = rigidity.apply(
+                coords.reshape(len(chunk), nverts, 3).astype(np.float64))
+            coords = coords.astype(np.float32).reshape(len(chunk), -1)
+            for k, sname in enumerate(chunk):
+                skeys[sname].data.foreach_set("co", coords[k])
+
+    def findIgnored(self, src, trg, snames):
+        """The shapekeys in snames that do not move any vertex inside trg"""
+        if self.morphBounds is None:
+            self.morphBounds = MorphBounds(src, snames, 0.01 * src.DazScale)  # 0.1 mm
+        return set([sname for sname in snames
+                    if self.ignoreMorph(src, trg, sname)])
+
+    def ignoreMorph(self, src, trg, sname):
+        bounds = self.morphBounds.get(sname)
+        if bounds is None:
+            return False
+        if trg.name not in self.meshBounds:
+            self.meshBounds[trg.name] = MorphBounds.meshBounds(trg)
+        tbounds = self.meshBounds[trg.name]
+        if tbounds is None:
+            return False
+        return bool(np.any(tbounds[0] > bounds[1]) or np.any(tbounds[1] < bounds[0]))
 
     def findMatch(self, src, trg):
 
@@ -454,13 +722,24 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
 
         if self.transferMethod == 'LEGACY':
             return True
-        elif self.transferMethod == 'BODY':
+
+        key = MatchCache.key(self.transferMethod, src, trg)
+        self.match = MatchCache.get(key)
+        if self.match is not None:
+            t2 = perf_counter()
+            print("Matching table loaded in %.1f seconds" % (t2-t1))
+            return True
+
+        if self.transferMethod == 'BODY':
             self.findMatchExact(src, trg)
         elif self.transferMethod == 'NEAREST':
+            if self.triIndex is None:
+                self.findTriangles(self.trihuman)
             self.findMatchNearest(self.trihuman, trg)
         elif self.transferMethod == 'GEOGRAFT':
             self.findMatchGeograft(src, trg)
 
+        MatchCache.put(key, self.match)
         t2 = perf_counter()
         print("Matching table created in %.1f seconds" % (t2-t1))
         return True
@@ -562,56 +841,96 @@ class DAZ_OT_TransferShapekeys(DazOperator, JCMSelector, FastMatcher, DriverUser
             self.match.append((cvn, hvn, cv.co - hv.co))
 
     def autoTransferExact(self, src, trg, hskey):
-        cverts = trg.data.vertices
-        hverts = src.data.vertices
+        ccos = self.getBatched(src, hskey.name)
         cskey = trg.shape_key_add(name=hskey.name)
-        if self.useSelectedOnly:
-            for cvn, hvn, offset in self.match:
-                if cverts[cvn].select:
-                    cskey.data[cvn].co = hskey.data[hvn].co + offset
-        else:
-            for cvn, hvn, offset in self.match:
-                cskey.data[cvn].co = hskey.data[hvn].co + offset
+        self.setShapekeyCoords(trg, cskey, ccos, self.matchArrays[0])
         return True
 
     # ----------------------------------------------------------
-    #   Nearest vertex and face matching
+    #   Batched transfer
     # ----------------------------------------------------------
 
-    def nearestNeighbor(self, hvn, hverts, cverts):
-        diff = cverts - hverts[hvn]
-        dists = np.sum(np.abs(diff), axis=1)
-        cvn = np.argmin(dists, axis=0)
-        return cvn, hvn, Vector(cverts[cvn]-hverts[hvn])
+    batchLimit = 2**24
+
+    def startBatch(self, hskeys, snames):
+        """Prepare to transfer the shapekeys snames in chunks"""
+        self.batchNames = [sname for sname in snames
+                           if sname in hskeys.key_blocks.keys()]
+        self.batch = {}
+        if self.transferMethod in ['BODY', 'GEOGRAFT']:
+            cvns = np.array([cvn for cvn, _, _ in self.match], dtype=np.int64)
+            hvns = np.array([hvn for _, hvn, _ in self.match], dtype=np.int64)
+            offsets = np.array([tuple(offset) for _, _, offset in self.match],
+                               dtype=np.float64).reshape(-1, 3)
+            self.matchArrays = (cvns, hvns, offsets)
+
+    def getBatched(self, src, sname):
+        """Transferred coordinates of the source shapekey sname"""
+        if sname not in self.batch:
+            if self.transferMethod == 'NEAREST':
+                size = 9*len(self.match[0])
+            else:
+                size = 3*len(self.matchArrays[0])
+            nkeys = max(1, self.batchLimit // max(1, size))
+            first = self.batchNames.index(sname)
+            self.batch = self.transferBatch(
+                src, self.batchNames[first:first+nkeys])
+        return self.batch[sname]
+
+    def transferBatch(self, src, snames):
+        """Transfer the shapekeys snames together as one (K, N, 3) array"""
+        hskeys = src.data.shape_keys.key_blocks
+        nverts = len(src.data.vertices)
+        hcos = np.empty((len(snames), 3*nverts), dtype=np.float32)
+        for k, sname in enumerate(snames):
+            hskeys[sname].data.foreach_get("co", hcos[k])
+        hcos = hcos.reshape(len(snames), nverts, 3)
 
-    def findMatchGeograft(self, src, trg):
-        hverts = np.array([list(v.co) for v in src.data.vertices])
-        cverts = np.array([list(v.co) for v in trg.data.vertices])
-        nhverts = len(hverts)
-        self.match = [self.nearestNeighbor(
-            hvn, hverts, cverts) for hvn in range(nhverts)]
+        if self.transferMethod == 'NEAREST':
+            tris, w, offsets = self.match
+            ccos = np.einsum("kmjc,mj->kmc", hcos[:, tris], w) + offsets
+        else:
+            _, hvns, offsets = self.matchArrays
+            ccos = hcos[:, hvns] + offsets
+        return dict(zip(snames, ccos))
+
+    def setShapekeyCoords(self, trg, cskey, ccos, cvns=None):
+        """Write ccos to the vertices cvns of cskey, or to all vertices"""
+        if cvns is None and not self.useSelectedOnly:
+            cskey.data.foreach_set("co", ccos.astype(np.float32).ravel())
+            return
 
-    def autoTransferFace(self, src, trg, hskey):
-        cskey = trg.shape_key_add(name=hskey.name)
+        nverts = len(trg.data.vertices)
+        co = np.empty(3*nverts, dtype=np.float32)
+        cskey.data.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+        if cvns is None:
+            cvns = np.arange(nverts)
+        if self.useSelectedOnly:
+            select = np.empty(nverts, dtype=bool)
+            trg.data.vertices.foreach_get("select", select)
+            mask = select[cvns]
+            cvns = cvns[mask]
+            ccos = ccos[mask]
+        co[cvns] = ccos
+        cskey.data.foreach_set("co", co.ravel())
 
-        hcos = np.array([list(data.co) for data in hskey.data])
-        tris, w, offsets = self.match
-        tcos = hcos[tris]
-        ccos = np.sum(tcos * w[:, :, None], axis=1) + offsets
+    # ----------------------------------------------------------
+    #   Nearest vertex and face matching
+    # ----------------------------------------------------------
 
-        if self.useSelectedOnly:
-            for cvn, co in enumerate(ccos):
-                # Синтаксическая ошибка
-                #
-                # if cverts[cvn].select:
-                #     cskey.data[cvn].co = co
-                #
-                # Заменини на
-                cskey.data[cvn].co = co
+    def findMatchGeograft(self, src, trg):
+        hverts = SpatialIndex.coords(src)
+        cverts = SpatialIndex.coords(trg)
+        cvns, _ = VertexIndex(cverts).nearest(hverts)
+        offsets = cverts[cvns] - hverts
+        self.match = [(cvn, hvn, Vector(offset))
+                      for hvn, (cvn, offset) in enumerate(zip(cvns, offsets))]
 
-        else:
-            for cvn, co in enumerate(ccos):
-                cskey.data[cvn].co = co
+    def autoTransferFace(self, src, trg, hskey):
+        ccos = self.getBatched(src, hskey.name)
+        cskey = trg.shape_key_add(name=hskey.name)
+        self.setShapekeyCoords(trg, cskey, ccos)
         return True
 
 # ----------------------------------------------------------
@@ -854,6 +1173,181 @@ class DAZ_OT_MixShapekeys(DazOperator):
         ob.active_shape_key_index = idx
         bpy.ops.object.shape_key_remove()
 
+# ----------------------------------------------------------
+#   Prune shapekeys
+# ----------------------------------------------------------
+
+
+@Registrar()
+class DAZ_OT_PruneShapekeys(DazPropsOperator, DriverUser, IsMesh):
+    bl_idname = "daz.prune_shapekeys"
+    bl_label = "Prune Shapekeys"
+    bl_description = (
+        "Remove shapekeys that do not move any vertex,\n" +
+        "and merge shapekeys with identical deltas and drivers")
+    bl_options = {'UNDO'}
+
+    tolerance: FloatProperty(
+        name="Tolerance",
+        description="Maximal vertex offset for shapekeys considered equal",
+        min=0.0,
+        precision=6,
+        default=1e-5)
+
+    removeZero: BoolProperty(
+        name="Remove Zero Shapekeys",
+        description="Remove shapekeys where no vertex moves more than the tolerance",
+        default=True)
+
+    mergeDuplicates: BoolProperty(
+        name="Merge Duplicates",
+        description=(
+            "Merge shapekeys with the same deltas and the same driver.\n" +
+            "The kept shapekey is scaled by the number of merged shapekeys"),
+        default=True)
+
+    def draw(self, context):
+        self.layout.prop(self, "tolerance")
+        self.layout.prop(self, "removeZero")
+        self.layout.prop(self, "mergeDuplicates")
+
+    def run(self, context):
+        t1 = perf_counter()
+        nkeys = nbytes = 0
+        for ob in BlenderStatic.selected_meshes(context):
+            n = self.pruneShapekeys(ob)
+            nkeys += n
+            nbytes += 12*n*len(ob.data.vertices)
+        t2 = perf_counter()
+        print("%d shapekeys pruned in %.3f seconds, %.1f MB saved" %
+              (nkeys, t2-t1, nbytes/2**20))
+
+    def pruneShapekeys(self, ob):
+        skeys = ob.data.shape_keys
+        if skeys is None or len(skeys.key_blocks) < 2:
+            return 0
+
+        nverts = len(ob.data.vertices)
+        bases = {}
+
+        def getCoords(skey):
+            co = np.empty(3*nverts, dtype=np.float32)
+            skey.data.foreach_get("co", co)
+            return co
+
+        def getBase(skey):
+            if skey.name not in bases:
+                bases[skey.name] = getCoords(skey)
+            return bases[skey.name]
+
+        drivers = self.getShapekeyDrivers(ob, {})
+        refs = self.getShapekeyRefs(ob)
+        basis = skeys.reference_key
+        relatives = set([skey.relative_key.name for skey in skeys.key_blocks])
+        zeros = []
+        buckets = {}
+
+        for skey in skeys.key_blocks:
+            sname = skey.name
+            if skey == basis or sname in relatives:
+                continue
+            delta = getCoords(skey) - getBase(skey.relative_key)
+            if self.tolerance > 0:
+                cells = np.round(delta/self.tolerance).astype(np.int64)
+            else:
+                cells = delta
+            if not cells.any():
+                if self.removeZero and sname not in refs.keys():
+                    zeros.append(sname)
+                continue
+            if self.mergeDuplicates and sname in drivers.keys():
+                key = (cells.tobytes(), self.getSignature(skey, drivers[sname]))
+                buckets.setdefault(key, []).append(sname)
+
+        merged = {}
+        for snames in buckets.values():
+            if len(snames) < 2:
+                continue
+            snames.sort(key=lambda sname: (len(sname), sname))
+            skey = skeys.key_blocks[snames[0]]
+            co = getCoords(skey)
+            base = getBase(skey.relative_key)
+            for sname in snames[1:]:
+                co += getCoords(skeys.key_blocks[sname]) - base
+                merged[sname] = skey.name
+            skey.data.foreach_set("co", co)
+
+        self.rewireRefs(refs, merged)
+
+        removed = zeros + list(merged.keys())
+        for sname in removed:
+            if sname in drivers.keys():
+                skeys.driver_remove('key_blocks["%s"].value' % sname)
+            ob.shape_key_remove(skeys.key_blocks[sname])
+        self.removeMorphInfo(ob, set(removed))
+
+        Updating.drivers(skeys)
+        if zeros or merged:
+            print("%s: %d zero and %d duplicate shapekeys removed" %
+                  (ob.name, len(zeros), len(merged)))
+        return len(zeros) + len(merged)
+
+    def removeMorphInfo(self, ob, snames):
+        """Remove the url and body part entries of removed shapekeys"""
+        pgs = ob.DazMorphUrls
+        for idx in reversed(range(len(pgs))):
+            item = pgs[idx]
+            if (item.prop or item.text) in snames:
+                pgs.remove(idx)
+        for pgs in [ob.data.DazBodyPart, ob.data.DazMorphFiles, ob.data.DazDhdmFiles]:
+            for idx in reversed(range(len(pgs))):
+                if pgs[idx].name in snames:
+                    pgs.remove(idx)
+
+    def getSignature(self, skey, fcu):
+        """Everything that decides the value of a driven shapekey"""
+        driver = fcu.driver
+        variables = []
+        for var in driver.variables:
+            targets = tuple([
+                (trg.id_type, trg.id.name if trg.id else "", trg.data_path,
+                 trg.bone_target, trg.transform_type, trg.transform_space)
+                for trg in var.targets])
+            variables.append((var.name, var.type, targets))
+        return (driver.type, driver.expression, tuple(variables),
+                skey.relative_key.name, skey.vertex_group, skey.interpolation,
+                round(skey.slider_min, 6), round(skey.slider_max, 6))
+
+    def getDriverRnas(self, ob):
+        rnas = [ob, ob.data, ob.data.shape_keys]
+        rig = ob.parent
+        if rig and rig.type == 'ARMATURE':
+            rnas += [rig, rig.data]
+            for child in rig.children:
+                if child.type == 'MESH' and child != ob and child.data.shape_keys:
+                    rnas.append(child.data.shape_keys)
+        return [rna for rna in rnas if rna.animation_data]
+
+    def getShapekeyRefs(self, ob):
+        """Driver targets that read the value of a shapekey of ob"""
+        skeys = ob.data.shape_keys
+        refs = {}
+        for rna in self.getDriverRnas(ob):
+            for fcu in rna.animation_data.drivers:
+                for var in fcu.driver.variables:
+                    for trg in var.targets:
+                        if trg.id_type == 'KEY' and trg.id == skeys:
+                            words = trg.data_path.split('"')
+                            if len(words) == 3 and words[0] == "key_blocks[":
+                                refs.setdefault(words[1], []).append(trg)
+        return refs
+
+    def rewireRefs(self, refs, merged):
+        for sname, keep in merged.items():
+            for trg in refs.get(sname, []):
+                trg.data_path = trg.data_path.replace(
+                    '"%s"' % sname, '"%s"' % keep, 1)
+
 # -------------------------------------------------------------
 #   Prune vertex groups
 # -------------------------------------------------------------